@@ -0,0 +1,104 @@
+# attachments.py
+# Stockage des pièces jointes (photos, preuves) adressé par contenu : chaque fichier est haché
+# en flux (sha256, par blocs) puis copié une seule fois sous <dossier>/<aa>/<bb>/<sha256>.
+# La base ne garde que le hash et la taille (tables attachments / target_attachments).
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import Dict, Optional
+
+import db
+
+# Dossier du stockage : SHADOWHUNTER_ATTACHMENTS, sinon "attachments" à côté de la base
+ATTACHMENTS_DIR = os.environ.get("SHADOWHUNTER_ATTACHMENTS")
+# Taille des blocs lus pour le hachage
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def store_dir() -> str:
+    if ATTACHMENTS_DIR:
+        return ATTACHMENTS_DIR
+    base = os.path.dirname(os.path.abspath(db.DB_NAME)) if db.DB_NAME != ":memory:" else os.getcwd()
+    return os.path.join(base, "attachments")
+
+
+def blob_path(sha256: str) -> str:
+    """Chemin du fichier stocké pour un hash (deux niveaux de sous-dossiers pour borner leur taille)."""
+    return os.path.join(store_dir(), sha256[:2], sha256[2:4], sha256)
+
+
+def hash_file(path: str, chunk_size: int = HASH_CHUNK_SIZE) -> tuple:
+    """sha256 (hex) et taille du fichier, lus par blocs dans un tampon réutilisé (mémoire constante)."""
+    digest = hashlib.sha256()
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    size = 0
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            digest.update(view[:n])
+            size += n
+    return digest.hexdigest(), size
+
+
+def store_file(path: str) -> Dict[str, object]:
+    """
+    Range le fichier dans le stockage. Un contenu déjà présent (même hash, même taille) n'est pas
+    recopié : ré-ajouter un fichier ne coûte qu'une passe de hachage.
+    Retourne {"sha256", "size", "path", "copied"}.
+    """
+    sha256, size = hash_file(path)
+    dest = blob_path(sha256)
+    copied = False
+    if not (os.path.exists(dest) and os.path.getsize(dest) == size):
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        # copie vers un fichier temporaire du même dossier puis renommage atomique :
+        # un fichier stocké est toujours complet, même si deux ajouts du même contenu se croisent
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), prefix=".tmp-")
+        os.close(fd)
+        try:
+            shutil.copyfile(path, tmp)  # copie noyau (sendfile) quand disponible, sans charger le fichier
+            os.replace(tmp, dest)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        copied = True
+    return {"sha256": sha256, "size": size, "path": dest, "copied": copied}
+
+
+def add_attachment(target_id: Optional[int], path: str, kind: Optional[str] = None) -> Dict[str, object]:
+    """Stocke le fichier et le rattache à target_id. Retourne store_file() + {"linked": nouveau lien ?}."""
+    stored = store_file(path)
+    stored["linked"] = db.save_attachment(target_id, stored["sha256"], stored["size"], kind, os.path.basename(path))
+    return stored
+
+
+def open_attachment(sha256: str):
+    """Ouvre en lecture binaire le fichier stocké pour ce hash."""
+    return open(blob_path(sha256), "rb")
+
+
+def collect_orphans(dry_run: bool = False) -> int:
+    """Supprime les fichiers (et lignes attachments) qui ne sont plus rattachés à aucune cible. Retourne leur nombre."""
+    orphans = [r[0] for r in db.get_conn().execute("""
+        SELECT sha256 FROM attachments a
+        WHERE NOT EXISTS (SELECT 1 FROM target_attachments t WHERE t.sha256 = a.sha256)
+    """)]
+    if dry_run:
+        return len(orphans)
+    removed = 0
+    for sha256 in orphans:
+        # re-vérifié dans la transaction : le contenu a pu être rattaché entre-temps
+        with db.transaction() as conn:
+            gone = conn.execute("""
+                DELETE FROM attachments WHERE sha256 = ?
+                AND NOT EXISTS (SELECT 1 FROM target_attachments t WHERE t.sha256 = ?)
+            """, (sha256, sha256)).rowcount
+        if gone:
+            removed += 1
+            if os.path.exists(blob_path(sha256)):
+                os.remove(blob_path(sha256))
+    return removed
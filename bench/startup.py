@@ -0,0 +1,80 @@
+# bench/startup.py
+# Mesure du temps de démarrage (style `python -X importtime`) de main.py et summary.py.
+# Usage : python bench/startup.py [--runs 5] [--top 10] [--out startup.json]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# nom -> code exécuté dans un interpréteur neuf
+SCENARIOS = {
+    "main_import": "import main",
+    "summary_import": "import summary",
+    # chemin --no-llm complet sur une base vide en mémoire (sans écrire de fichiers)
+    "summary_no_llm": (
+        "import db, summary; db.set_db_path(':memory:'); db.init_db();"
+        "t = db.save_target({'nom': 'bench'});"
+        "summary.local_summarize_items(summary.assemble_report_items(t))"
+    ),
+}
+
+
+def _importtime(code: str):
+    """Lance `python -X importtime -c code` et retourne [(cumul_us, module, niveau)]."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((int(cumulative), name.strip(), depth))
+    return rows
+
+
+def _wall(code: str, runs: int) -> list:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run(runs: int = 5, top: int = 10) -> dict:
+    """Imports et temps mesurés au-delà d'un interpréteur vide (`python -c pass`)."""
+    report = {"python": sys.version.split()[0], "scenarios": {}}
+    startup_modules = {name for _, name, _ in _importtime("pass")}
+    baseline = statistics.median(_wall("pass", runs))
+    report["interpreter_wall_s"] = baseline
+    for name, code in SCENARIOS.items():
+        imports = [r for r in _importtime(code) if r[1] not in startup_modules]
+        wall = _wall(code, runs)
+        report["scenarios"][name] = {
+            "wall_median_s": statistics.median(wall),
+            "wall_over_interpreter_s": statistics.median(wall) - baseline,
+            "imports_total_us": sum(c for c, _, depth in imports if depth == 0),
+            "top_imports": [{"module": n, "cumulative_us": c} for c, n, _ in sorted(imports, reverse=True)[:top]],
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Startup-time benchmark for main.py / summary.py")
+    parser.add_argument("--runs", type=int, default=5, help="Wall-clock runs per scenario (median reported)")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list")
+    parser.add_argument("--out", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    res = run(args.runs, args.top)
+    text = json.dumps(res, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
@@ -0,0 +1,153 @@
+# bench/stubs.py
+# Serveurs HTTP locaux imitant HIBP (/breachedaccount, /breaches) et un endpoint chat-completions,
+# avec latence et réponses 429 configurables. Utilisés par bench/suite.py.
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import unquote, urlparse
+
+# (status, en-têtes, corps) retourné par une route
+Response = Tuple[int, Dict[str, str], bytes]
+
+
+class StubServer:
+    """
+    Serveur HTTP de test sur 127.0.0.1 (port libre), dans un thread.
+    - latency : délai ajouté à chaque réponse (secondes)
+    - rate_limit_every : une requête sur N reçoit 429 + Retry-After (0 = jamais)
+    - retry_after : valeur de l'en-tête Retry-After (secondes)
+    Compteurs dans `stats` : requests, rate_limited, par route.
+    """
+
+    def __init__(self, routes: Dict[Tuple[str, str], Callable[..., Response]], latency: float = 0.0,
+                 rate_limit_every: int = 0, retry_after: float = 0.0):
+        self.routes = routes
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.stats: Dict[str, int] = {"requests": 0, "rate_limited": 0}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stub-http", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _count(self, key: str) -> int:
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+            return self.stats[key]
+
+    def _handle(self, handler: BaseHTTPRequestHandler, method: str):
+        n = self._count("requests")
+        # corps lu avant toute réponse (429 compris) pour garder la connexion keep-alive utilisable
+        length = int(handler.headers.get("Content-Length") or 0)
+        handler.request_body = handler.rfile.read(length) if length else b""
+        if self.latency:
+            time.sleep(self.latency)
+        if self.rate_limit_every and n % self.rate_limit_every == 0:
+            self._count("rate_limited")
+            status, headers, body = 429, {"Retry-After": str(self.retry_after)}, b'{"statusCode": 429}'
+        else:
+            path = urlparse(handler.path).path
+            for (route_method, prefix), func in self.routes.items():
+                if route_method == method and path.startswith(prefix):
+                    self._count(prefix)
+                    status, headers, body = func(handler, path[len(prefix):])
+                    break
+            else:
+                status, headers, body = 404, {}, b""
+        handler.send_response(status)
+        headers = {"Content-Type": "application/json", **headers, "Content-Length": str(len(body))}
+        for k, v in headers.items():
+            handler.send_header(k, v)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, comme le vrai service
+
+            def do_GET(self):
+                stub._handle(self, "GET")
+
+            def do_POST(self):
+                stub._handle(self, "POST")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# ----------------------
+# HIBP
+# ----------------------
+def hibp_stub(catalog: List[dict], max_breaches: int = 5, **kwargs) -> StubServer:
+    """
+    Stub HIBP : /breachedaccount/<email> répond une liste tronquée déterministe (0 à max_breaches
+    noms du catalogue selon le hash de l'email, 404 si vide) ; /breaches sert le catalogue avec ETag.
+    """
+    names = [b["Name"] for b in catalog]
+    catalog_body = json.dumps(catalog).encode("utf-8")
+    etag = '"' + hashlib.sha1(catalog_body).hexdigest() + '"'
+
+    def breached_account(handler, rest) -> Response:
+        digest = hashlib.sha256(unquote(rest).lower().encode("utf-8")).digest()
+        count = digest[0] % (max_breaches + 1)
+        picked = sorted({names[b % len(names)] for b in digest[1:1 + count]})
+        if not picked:
+            return 404, {}, b""
+        return 200, {}, json.dumps([{"Name": n} for n in picked]).encode("utf-8")
+
+    def all_breaches(handler, rest) -> Response:
+        if handler.headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+        return 200, {"ETag": etag}, catalog_body
+
+    return StubServer({("GET", "/breachedaccount/"): breached_account, ("GET", "/breaches"): all_breaches}, **kwargs)
+
+
+# ----------------------
+# Chat completions (API OpenAI)
+# ----------------------
+def llm_stub(reply_words: int = 120, **kwargs) -> StubServer:
+    """Stub POST /chat/completions : réponse fixe de reply_words mots, usage calculé grossièrement."""
+    def chat_completions(handler, rest) -> Response:
+        request = json.loads(handler.request_body or b"{}")
+        prompt_chars = sum(len(m.get("content", "")) for m in request.get("messages", []))
+        content = " ".join(["résumé"] * reply_words)
+        body = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "bench"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": reply_words,
+                      "total_tokens": prompt_chars // 4 + reply_words},
+        }
+        return 200, {}, json.dumps(body).encode("utf-8")
+
+    return StubServer({("POST", "/chat/completions"): chat_completions}, **kwargs)
@@ -0,0 +1,240 @@
+# bench/suite.py
+# Benchmarks reproductibles : bases synthétiques à plusieurs échelles (db / summary), puis
+# search_email et _call_llm contre des serveurs HTTP locaux (latence et 429 configurables).
+# Usage : python bench/suite.py [--scales 1000,10000,100000] [--repeat 3] [--out bench.json]
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import db  # noqa: E402
+import metrics  # noqa: E402
+import summary  # noqa: E402
+import synthetic  # noqa: E402
+import stubs  # noqa: E402
+
+PER_ROW_SAMPLE = 1000  # lignes insérées via les fonctions unitaires (save_source_result...)
+
+
+def measure(func, repeat: int = 3) -> dict:
+    """Durée médiane sur `repeat` exécutions, puis une exécution sous tracemalloc pour le pic mémoire."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"wall_s": statistics.median(runs), "runs_s": runs, "peak_kib": round(peak / 1024, 1)}
+
+
+def bench_init_db(workdir: str, repeat: int) -> dict:
+    """init_db sur une base neuve (création + toutes les migrations) puis sur une base déjà à jour."""
+    path = os.path.join(workdir, "init.db")
+
+    def fresh():
+        db.close_conn()
+        synthetic.remove_db(path)
+        db.set_db_path(path)
+        db.init_db()
+
+    res = {"fresh": measure(fresh, repeat), "up_to_date": measure(db.init_db, repeat)}
+    db.close_conn()
+    return res
+
+
+def bench_scale(rows: int, workdir: str, repeat: int, seed: int) -> dict:
+    path = os.path.join(workdir, f"synthetic_{rows}.db")
+    start = time.perf_counter()
+    info = synthetic.make_db(path, rows, seed)
+    generate_s = time.perf_counter() - start
+    target_id = info["target_id"]
+    for entry in info["save"].values():
+        entry["rows_per_s"] = round(entry["rows"] / entry["wall_s"]) if entry["wall_s"] else None
+
+    # chemin unitaire (une transaction par ligne), sur une cible séparée
+    sample_target = db.save_target({"nom": "per-row"})
+    rng = random.Random(seed)
+    sample = [synthetic.source_result(rng, i) for i in range(PER_ROW_SAMPLE)]
+
+    def per_row():
+        for r in sample:
+            db.save_source_result(sample_target, r["source"], r["type"], r["url"], r["score"], r["summary"], r["raw"])
+
+    per_row_res = measure(per_row, 1)
+    per_row_res["rows_per_s"] = round(PER_ROW_SAMPLE / per_row_res["wall_s"])
+
+    items = summary.assemble_report_items(target_id)
+    out = os.path.join(workdir, f"export_{rows}")
+    res = {
+        "rows": info["rows"],
+        "db_size_bytes": os.path.getsize(path),
+        "generate_s": generate_s,
+        "save": info["save"],
+        "save_source_result_per_row": per_row_res,
+        "assemble_report_items": measure(lambda: summary.assemble_report_items(target_id), repeat),
+        # exporteurs alimentés par le générateur, comme dans summarize_target
+        "export_json": measure(lambda: summary.export_json(summary.iter_report_items(target_id), out + ".json"), repeat),
+        "export_txt": measure(lambda: summary.export_txt(summary.iter_report_items(target_id), out + ".txt"), repeat),
+        "local_summarize_items": measure(lambda: summary.local_summarize_items(items), repeat),
+        "local_summarize_target": measure(lambda: summary.local_summarize_target(target_id), repeat),
+    }
+    res["export_bytes"] = {"json": os.path.getsize(out + ".json"), "txt": os.path.getsize(out + ".txt")}
+    del items
+    db.close_conn()
+    return res
+
+
+def bench_hibp(workdir: str, emails: int, latency: float, rate_limit_every: int, retry_after: float) -> dict:
+    """search_email (cache contourné, sauvegarde comprise) sur `emails` adresses contre le stub HIBP."""
+    import email_search
+    from hibp_client import HibpClient
+
+    path = os.path.join(workdir, "hibp.db")
+    synthetic.remove_db(path)
+    db.set_db_path(path)
+    db.init_db()
+    target_id = db.save_target({"nom": "hibp-bench"})
+    with stubs.hibp_stub(synthetic.breach_catalog(), latency=latency, rate_limit_every=rate_limit_every,
+                         retry_after=retry_after) as server:
+        # débit non limité côté client : on mesure le service et les relances, pas le quota HIBP
+        email_search._client = HibpClient(api_key="bench", base_url=server.url, rate_per_min=600_000,
+                                          backoff_base=0.01, max_retries=6)
+        metrics.reset()
+        metrics.enable()
+        calls = []
+        errors = 0
+        start = time.perf_counter()
+        try:
+            for i in range(emails):
+                t = time.perf_counter()
+                res = email_search.search_email(f"bench{i}@example.com", target_id=target_id, cache="bypass")
+                calls.append(time.perf_counter() - t)
+                errors += any(n.startswith("Erreur") for n in res["notes"])
+        finally:
+            metrics.enable(False)
+            email_search._client.close()
+            email_search._client = None
+        wall = time.perf_counter() - start
+        stats = dict(server.stats)
+    saved = db.get_conn().execute("SELECT COUNT(*) FROM email_breaches WHERE target_id = ?", (target_id,)).fetchone()[0]
+    db.close_conn()
+    return {
+        "emails": emails, "latency_s": latency, "rate_limit_every": rate_limit_every, "retry_after_s": retry_after,
+        "wall_s": wall, "call_p50_s": statistics.median(calls), "call_p95_s": _p95(calls),
+        "errors": errors, "breaches_saved": saved, "server": stats, "metrics": metrics.report(),
+    }
+
+
+def bench_llm(calls: int, latency: float, rate_limit_every: int) -> dict:
+    """_call_llm contre le stub chat-completions ; les 429 remontent en erreurs (pas de relance dans _call_llm)."""
+    if not summary._HAS_OPENAI:
+        return {"skipped": "openai package not installed"}
+    env = {k: os.environ.get(k) for k in ("OPENAI_API_KEY", "OPENAI_BASE_URL")}
+    with stubs.llm_stub(latency=latency, rate_limit_every=rate_limit_every) as server:
+        os.environ["OPENAI_API_KEY"] = "bench"
+        os.environ["OPENAI_BASE_URL"] = server.url
+        prompt = synthetic.sample_text(random.Random(0), 400)
+        durations = []
+        errors = 0
+        start = time.perf_counter()
+        try:
+            for _ in range(calls):
+                t = time.perf_counter()
+                try:
+                    summary._call_llm(prompt, model="bench")
+                except RuntimeError:
+                    errors += 1
+                durations.append(time.perf_counter() - t)
+        finally:
+            for k, v in env.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
+        wall = time.perf_counter() - start
+        stats = dict(server.stats)
+    return {
+        "calls": calls, "latency_s": latency, "rate_limit_every": rate_limit_every, "wall_s": wall,
+        "call_p50_s": statistics.median(durations), "call_p95_s": _p95(durations),
+        "errors": errors, "server": stats,
+    }
+
+
+def _p95(values: list) -> float:
+    return metrics._percentile(sorted(values), 0.95)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def run(scales, repeat: int = 3, seed: int = 0, workdir: str = None, emails: int = 50, llm_calls: int = 20,
+        latency: float = 0.005, rate_limit_every: int = 10, retry_after: float = 0.05) -> dict:
+    own_dir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="shbench_")
+    os.makedirs(workdir, exist_ok=True)
+    report = {
+        "meta": {
+            "commit": _git_commit(), "python": sys.version.split()[0], "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(), "raw_codec": db.RAW_CODEC, "seed": seed, "repeat": repeat,
+        },
+        "init_db": None, "scales": {}, "network": {},
+    }
+    try:
+        report["init_db"] = bench_init_db(workdir, repeat)
+        for rows in scales:
+            report["scales"][str(rows)] = bench_scale(rows, workdir, repeat, seed)
+        report["network"]["search_email"] = bench_hibp(workdir, emails, latency, rate_limit_every, retry_after)
+        report["network"]["call_llm"] = bench_llm(llm_calls, latency, rate_limit_every)
+    finally:
+        db.close_conn()
+        if own_dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark suite for db.py / summary.py / network paths")
+    parser.add_argument("--scales", default="1000,10000,100000",
+                        help="Comma-separated result-row counts for the synthetic databases (e.g. 1000,1000000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per measurement (median reported)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic data")
+    parser.add_argument("--workdir", default=None, help="Keep generated databases/exports here (default: temp dir, removed)")
+    parser.add_argument("--emails", type=int, default=50, help="search_email calls against the HIBP stub")
+    parser.add_argument("--llm-calls", type=int, default=20, help="_call_llm calls against the chat-completions stub")
+    parser.add_argument("--latency", type=float, default=0.005, help="Stub response latency in seconds")
+    parser.add_argument("--rate-limit-every", type=int, default=10, help="Stubs answer 429 to one request in N (0 = never)")
+    parser.add_argument("--retry-after", type=float, default=0.05, help="Retry-After sent with stub 429 responses")
+    parser.add_argument("--out", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    scales = [int(x) for x in args.scales.split(",") if x.strip()]
+    res = run(scales, args.repeat, args.seed, args.workdir, args.emails, args.llm_calls,
+              args.latency, args.rate_limit_every, args.retry_after)
+    text = json.dumps(res, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
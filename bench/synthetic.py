@@ -0,0 +1,148 @@
+# bench/synthetic.py
+# Génère une base shadowhunter synthétique et reproductible (graine fixe) : une cible portant
+# `rows` lignes de résultats (≈10 % breaches, 80 % sources, 10 % lookups téléphone).
+# Usage : python bench/synthetic.py --rows 100000 --out /tmp/bench_100k.db
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import db  # noqa: E402
+
+CATALOG_SIZE = 800
+BREACHES_PER_EMAIL = 40
+CHUNK_ROWS = 1000
+
+_WORDS = ("compte", "profil", "photo", "dakar", "forum", "archive", "publication", "contact",
+          "réseau", "pseudo", "mention", "commentaire", "annonce", "vidéo", "lien", "page")
+_SOURCES = ("google", "bing", "twitter_x", "instagram", "pastebin", "github", "reddit", "forum")
+
+
+def sample_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def breach_catalog(size: int = CATALOG_SIZE, seed: int = 0) -> list:
+    """Catalogue au format GET /breaches (objets complets, description HTML comprise)."""
+    rng = random.Random(seed)
+    catalog = []
+    for i in range(size):
+        catalog.append({
+            "Name": f"Breach{i:04d}",
+            "Title": f"Breach {i:04d}",
+            "Domain": f"breach{i:04d}.example",
+            "BreachDate": f"{2010 + i % 14}-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "AddedDate": "2024-01-01T00:00:00Z",
+            "PwnCount": rng.randint(1_000, 50_000_000),
+            "Description": "<p>" + sample_text(rng, 60) + ' <a href="https://example.org">source</a></p>',
+            "LogoPath": f"https://logos.example/{i}.png",
+            "DataClasses": ["Email addresses", "Passwords", "Usernames"][: 1 + i % 3],
+            "IsVerified": True, "IsFabricated": False, "IsSensitive": False,
+            "IsRetired": False, "IsSpamList": False, "IsMalware": False,
+        })
+    return catalog
+
+
+def source_result(rng: random.Random, i: int) -> dict:
+    source = rng.choice(_SOURCES)
+    return {
+        "source": source,
+        "type": rng.choice(("page", "post", "profile", "paste")),
+        "url": f"https://{source}.example/{i}",
+        "score": round(rng.random(), 4),
+        "summary": sample_text(rng, 12),
+        "raw": {"title": sample_text(rng, 6), "snippet": "<div>" + sample_text(rng, 40) + "</div>",
+                "rank": i % 50, "fetched": "2025-01-01T00:00:00Z"},
+    }
+
+
+def phone_lookup(rng: random.Random, i: int) -> dict:
+    numero = f"+22177{rng.randint(0, 9_999_999):07d}"
+    info = {"raw": numero, "e164": numero, "is_valid": True, "is_possible": True,
+            "country": "Senegal", "carrier": rng.choice(("Orange", "Free", "Expresso"))}
+    return {"numero": numero, "e164": numero, "country": info["country"], "carrier": info["carrier"],
+            "is_valid": True, "is_possible": True, "raw_json": json.dumps(info, ensure_ascii=False)}
+
+
+def _timed(timings: dict, name: str, func, *args) -> int:
+    start = time.perf_counter()
+    inserted = func(*args)
+    entry = timings.setdefault(name, {"calls": 0, "rows": 0, "wall_s": 0.0})
+    entry["calls"] += 1
+    entry["rows"] += len(args[-1])
+    entry["wall_s"] += time.perf_counter() - start
+    return inserted
+
+
+def populate(rows: int, seed: int = 0, chunk: int = CHUNK_ROWS) -> dict:
+    """
+    Remplit la base courante (db.init_db() déjà fait) via les fonctions save_* en lot.
+    Retourne {"target_id", "rows": {table: n}, "save": {fonction: {calls, rows, wall_s}}}.
+    """
+    rng = random.Random(seed)
+    timings: dict = {}
+    catalog = breach_catalog(seed=seed)
+    _timed(timings, "save_breach_catalog", db.save_breach_catalog, catalog)
+    target_id = db.save_target({"nom": "Synthetique", "prenom": "Cible", "pseudo": f"bench{rows}",
+                                "email": "user0@example.com", "numero": "+221770000000",
+                                "localisation": "Dakar", "alias": "cible.synthetique,csynthetique"})
+
+    n_breaches = rows // 10
+    n_phones = rows // 10
+    n_sources = rows - n_breaches - n_phones
+
+    names = [b["Name"] for b in catalog]
+    done = 0
+    email_no = 0
+    while done < n_breaches:
+        take = min(BREACHES_PER_EMAIL, n_breaches - done)
+        picked = [{"Name": n} for n in rng.sample(names, take)]
+        _timed(timings, "save_email_breaches", db.save_email_breaches, target_id, f"user{email_no}@example.com", picked)
+        done += take
+        email_no += 1
+    for start in range(0, n_sources, chunk):
+        batch = [source_result(rng, i) for i in range(start, min(n_sources, start + chunk))]
+        _timed(timings, "save_source_results", db.save_source_results, target_id, batch)
+    for start in range(0, n_phones, chunk):
+        batch = [phone_lookup(rng, i) for i in range(start, min(n_phones, start + chunk))]
+        _timed(timings, "save_phone_lookups", db.save_phone_lookups, target_id, batch)
+
+    return {
+        "target_id": target_id,
+        "rows": {"email_breaches": n_breaches, "source_results": n_sources, "phone_lookups": n_phones},
+        "save": timings,
+    }
+
+
+def remove_db(path: str):
+    """Supprime la base et ses fichiers WAL / SHM."""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def make_db(path: str, rows: int, seed: int = 0) -> dict:
+    """Crée (en écrasant) une base synthétique à `path` ; retourne le résultat de populate()."""
+    remove_db(path)
+    db.set_db_path(path)
+    db.init_db()
+    return populate(rows, seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic ShadowHunter database")
+    parser.add_argument("--rows", type=int, default=10_000, help="Number of result rows for the target")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (same seed => same content)")
+    parser.add_argument("--out", default="bench_synthetic.db", help="Database path (overwritten)")
+    args = parser.parse_args()
+
+    try:
+        info = make_db(args.out, args.rows, args.seed)
+    finally:
+        db.close_conn()
+    print(json.dumps(info, indent=2))
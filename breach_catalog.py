@@ -0,0 +1,92 @@
+# breach_catalog.py
+# Copie locale de la liste publique des breaches HIBP (GET /breaches), synchronisée périodiquement
+# en requête conditionnelle. Les recherches par compte utilisent la réponse tronquée (noms seuls)
+# puis sont enrichies ici (Title, Domain, BreachDate...).
+import os
+import time
+from typing import Optional
+
+import db
+
+# Intervalle minimal entre deux synchronisations (secondes)
+CATALOG_SYNC_INTERVAL = int(os.environ.get("HIBP_CATALOG_SYNC_INTERVAL", str(24 * 3600)))
+# Intervalle minimal avant de resynchroniser pour un nom de breach inconnu du catalogue
+CATALOG_MISS_INTERVAL = int(os.environ.get("HIBP_CATALOG_MISS_INTERVAL", "3600"))
+
+_STATE_ETAG = "breach_catalog.etag"
+_STATE_LAST_MODIFIED = "breach_catalog.last_modified"
+_STATE_SYNCED_AT = "breach_catalog.synced_at"
+
+
+def _default_client():
+    import email_search
+    return email_search.get_client()
+
+
+def last_synced_at() -> Optional[float]:
+    value = db.get_sync_state(_STATE_SYNCED_AT)
+    return float(value) if value else None
+
+
+def sync_breach_catalog(client=None, force: bool = False, max_age: Optional[float] = None, cancel=None) -> dict:
+    """
+    Synchronise le catalogue si la dernière synchro date de plus de max_age secondes
+    (CATALOG_SYNC_INTERVAL par défaut) ou si force=True. La requête est conditionnelle
+    (If-None-Match / If-Modified-Since) : un 304 ne transfère aucune donnée.
+    Retourne {"status": "skipped" | "not_modified" | "updated", "count": n}.
+    cancel : threading.Event optionnel transmis au client (interrompt ses attentes).
+    """
+    max_age = CATALOG_SYNC_INTERVAL if max_age is None else max_age
+    synced_at = last_synced_at()
+    if not force and synced_at is not None and time.time() - synced_at < max_age:
+        return {"status": "skipped", "count": 0}
+
+    client = client or _default_client()
+    etag = None if force else db.get_sync_state(_STATE_ETAG)
+    last_modified = None if force else db.get_sync_state(_STATE_LAST_MODIFIED)
+    resp = client.all_breaches(etag=etag, last_modified=last_modified, cancel=cancel)
+    if resp.status_code == 304:
+        db.set_sync_state({_STATE_SYNCED_AT: time.time()})
+        return {"status": "not_modified", "count": 0}
+
+    count = db.save_breach_catalog(resp.json())
+    db.set_sync_state({
+        _STATE_ETAG: resp.headers.get("ETag"),
+        _STATE_LAST_MODIFIED: resp.headers.get("Last-Modified"),
+        _STATE_SYNCED_AT: time.time(),
+    })
+    return {"status": "updated", "count": count}
+
+
+def enrich_breaches(breaches: list, client=None, cancel=None) -> list:
+    """
+    Complète une réponse HIBP tronquée ([{"Name": ...}]) avec les objets complets du catalogue.
+    Si des noms sont inconnus, tente une synchro (au plus une fois par CATALOG_MISS_INTERVAL).
+    Les entrées introuvables sont retournées telles quelles.
+    """
+    names = [b.get("Name") or b.get("name") for b in breaches]
+    known = db.fetch_breach_catalog([n for n in names if n])
+    if any(n and n not in known for n in names):
+        try:
+            res = sync_breach_catalog(client, max_age=CATALOG_MISS_INTERVAL, cancel=cancel)
+        except Exception:
+            res = {"status": "error"}
+        if res["status"] == "updated":
+            known = db.fetch_breach_catalog([n for n in names if n])
+    return [known.get(n, b) for n, b in zip(names, breaches)]
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Sync the local HIBP breach catalog")
+    parser.add_argument("--force", action="store_true", help="Ignore the sync interval and ETag/Last-Modified")
+    parser.add_argument("--db", default=None, help="SQLite database path (default: SHADOWHUNTER_DB or shadowhunter.db)")
+    args = parser.parse_args()
+
+    if args.db:
+        db.set_db_path(args.db)
+    try:
+        db.init_db()
+        print(sync_breach_catalog(force=args.force, max_age=0))
+    finally:
+        db.close_conn()
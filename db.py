@@ -1,16 +1,168 @@
+import os
+import queue
 import sqlite3
 import json
-from typing import Optional
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import List, Optional
 
-DB_NAME = "shadowhunter.db"
+import metrics
 
-def get_conn():
-    return sqlite3.connect(DB_NAME)
+# Chemin de la base : surchargeable via SHADOWHUNTER_DB (":memory:" accepté)
+DB_NAME = os.environ.get("SHADOWHUNTER_DB", "shadowhunter.db")
+
+# Pragmas appliqués à chaque ouverture de connexion
+PRAGMAS = (
+    # pages libérées rendues au fichier par retention.incremental_vacuum ; ne prend effet
+    # qu'à la création de la base (bases existantes : retention.enable_incremental_vacuum)
+    "PRAGMA auto_vacuum=INCREMENTAL",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-20000",  # ~20 Mo de cache de pages
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Taille du cache de requêtes préparées de sqlite3 (réutilisées tant que le texte SQL est identique)
+STATEMENT_CACHE_SIZE = 128
+
+_conn: Optional[sqlite3.Connection] = None
+_conn_lock = threading.RLock()
+
+
+def set_db_path(path: str):
+    """Change la base utilisée par le process (ferme la connexion courante)."""
+    global DB_NAME
+    close_conn()
+    DB_NAME = path
+
+
+def get_conn() -> sqlite3.Connection:
+    """
+    Retourne la connexion partagée du process (ouverte au premier appel).
+    Les appelants ne doivent pas la fermer : utiliser close_conn() en fin de process.
+    """
+    global _conn
+    if _conn is None:
+        with _conn_lock:
+            if _conn is None:
+                conn = sqlite3.connect(
+                    DB_NAME,
+                    isolation_level=None,  # transactions explicites via transaction()
+                    check_same_thread=False,
+                    cached_statements=STATEMENT_CACHE_SIZE,
+                )
+                for pragma in PRAGMAS:
+                    conn.execute(pragma)
+                _conn = conn
+    return _conn
+
+
+def close_conn():
+    """Ferme la connexion partagée si elle est ouverte."""
+    global _conn
+    with _conn_lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+
+
+@contextmanager
+def transaction():
+    """
+    Ouvre une transaction d'écriture sur la connexion partagée.
+    COMMIT en sortie normale, ROLLBACK si une exception est levée (COMMIT compris : disque plein,
+    SQLITE_BUSY...), pour que la connexion partagée ne reste jamais dans une transaction ouverte.
+    """
+    with _conn_lock:
+        conn = get_conn()
+        conn.execute("BEGIN")
+        try:
+            yield conn
+            with metrics.span("db.commit"):
+                conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+
+@contextmanager
+def locked_conn():
+    """
+    Connexion partagée sous le verrou des écritures, sans transaction ouverte :
+    pour les commandes interdites en transaction (VACUUM, PRAGMA incremental_vacuum).
+    """
+    with _conn_lock:
+        yield get_conn()
+
+
+# ----------------------
+# Codec des colonnes raw_json
+# ----------------------
+# Valeur stockée = BLOB : 1 octet de format + charge utile. Les anciennes lignes TEXT (JSON brut) restent lisibles.
+RAW_PLAIN = b"\x00"  # JSON utf-8 non compressé (petites charges où la compression ne gagne rien)
+RAW_ZLIB = b"\x01"   # JSON utf-8 compressé zlib
+RAW_ZSTD = b"\x02"   # JSON utf-8 compressé zstd (si le paquet zstandard est installé)
+
+# Codec d'écriture : "zlib" (défaut) ou "zstd"
+RAW_CODEC = os.environ.get("SHADOWHUNTER_RAW_CODEC", "zlib")
+RAW_COMPRESS_LEVEL = 6
+
+try:
+    import zstandard as _zstd
+except Exception:
+    _zstd = None
+
+def encode_raw(text: Optional[str]) -> Optional[bytes]:
+    """Encode une chaîne JSON pour stockage dans raw_json (None reste None)."""
+    if text is None:
+        return None
+    data = text.encode("utf-8")
+    if RAW_CODEC == "zstd" and _zstd is not None:
+        tag, packed = RAW_ZSTD, _zstd.ZstdCompressor(level=RAW_COMPRESS_LEVEL).compress(data)
+    else:
+        tag, packed = RAW_ZLIB, zlib.compress(data, RAW_COMPRESS_LEVEL)
+    if len(packed) >= len(data):
+        return RAW_PLAIN + data
+    return tag + packed
+
+def decode_raw(value) -> Optional[str]:
+    """Retourne le texte JSON d'une valeur raw_json, quel que soit son format (TEXT historique ou BLOB tagué)."""
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    tag, payload = value[:1], value[1:]
+    if tag == RAW_ZLIB:
+        return zlib.decompress(payload).decode("utf-8")
+    if tag == RAW_ZSTD:
+        if _zstd is None:
+            raise RuntimeError("raw_json compressé en zstd : installer le paquet zstandard pour le lire.")
+        return _zstd.ZstdDecompressor().decompress(payload).decode("utf-8")
+    if tag == RAW_PLAIN:
+        return payload.decode("utf-8")
+    raise ValueError(f"Format raw_json inconnu: {tag!r}")
+
+def load_raw(value):
+    """decode_raw + json.loads ; une valeur qui n'est pas du JSON est retournée telle quelle."""
+    text = decode_raw(value)
+    if not text:
+        return None
+    try:
+        return json.loads(text)
+    except Exception:
+        return text
 
 def init_db():
-    """Crée les tables nécessaires si elles n'existent pas."""
-    conn = get_conn()
-    cur = conn.cursor()
+    """Crée les tables nécessaires si elles n'existent pas, puis applique les migrations en attente."""
+    with transaction() as conn:
+        _create_tables(conn.cursor())
+    migrate()
+
+
+def _create_tables(cur: sqlite3.Cursor):
 
     cur.execute("""
     CREATE TABLE IF NOT EXISTS targets (
@@ -72,60 +224,537 @@ def init_db():
     )
     """)
 
+# ----------------------
+# Migrations de schéma versionnées
+# ----------------------
+def _migration_1(cur: sqlite3.Cursor):
+    """Index (target_id, found_at) sur les tables de résultats."""
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_email_breaches_target ON email_breaches(target_id, found_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_source_results_target ON source_results(target_id, found_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_phone_lookups_target ON phone_lookups(target_id, found_at)")
+
+def _migration_2(cur: sqlite3.Cursor):
+    """Une même breach n'est stockée qu'une fois par cible et par email (on garde la plus ancienne)."""
+    cur.execute("""
+        DELETE FROM email_breaches
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM email_breaches GROUP BY target_id, email, breach_name
+        )
+    """)
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_email_breaches_target_breach ON email_breaches(target_id, email, breach_name)")
+
+def _migration_3(cur: sqlite3.Cursor):
+    """Cache persistant des réponses HIBP (clé = hash de l'email normalisé)."""
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS hibp_cache (
+        key TEXT PRIMARY KEY,
+        status INTEGER,
+        body TEXT,
+        fetched_at REAL,
+        hits INTEGER DEFAULT 0
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_hibp_cache_fetched ON hibp_cache(fetched_at)")
+
+def _migration_4(cur: sqlite3.Cursor, batch_size: int = 500):
+    """Ré-encode (codec raw_json) les lignes historiques stockées en TEXT."""
+    for table in ("email_breaches", "source_results", "phone_lookups"):
+        while True:
+            rows = cur.execute(
+                f"SELECT id, raw_json FROM {table} WHERE typeof(raw_json) = 'text' LIMIT ?", (batch_size,)
+            ).fetchall()
+            if not rows:
+                break
+            cur.executemany(f"UPDATE {table} SET raw_json = ? WHERE id = ?", [(encode_raw(raw), rid) for rid, raw in rows])
 
-    conn.commit()
-    conn.close()
+def _table_columns(cur: sqlite3.Cursor, table: str) -> list:
+    return [r[1] for r in cur.execute(f"PRAGMA table_info({table})")]
 
+def _migration_5(cur: sqlite3.Cursor):
+    """
+    Catalogue des breaches (métadonnées globales, une ligne par nom) ; email_breaches devient
+    une table de liaison (target_id, email, breach_id, found_at).
+    """
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS breaches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        title TEXT,
+        breach_date TEXT,
+        domain TEXT,
+        raw_json BLOB,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    if "breach_id" in _table_columns(cur, "email_breaches"):
+        return
+    # pour chaque nom, on garde la version la plus riche (titre renseigné) puis la plus récente
+    cur.execute("""
+        INSERT OR IGNORE INTO breaches (name, title, breach_date, domain, raw_json)
+        SELECT name, breach_title, breach_date, breach_domain, raw_json FROM (
+            SELECT COALESCE(breach_name, '') AS name, breach_title, breach_date, breach_domain, raw_json,
+                   ROW_NUMBER() OVER (PARTITION BY COALESCE(breach_name, '')
+                                      ORDER BY breach_title IS NOT NULL DESC, id DESC) AS rn
+            FROM email_breaches
+        ) WHERE rn = 1
+    """)
+    cur.execute("""
+    CREATE TABLE email_breaches_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        target_id INTEGER,
+        email TEXT,
+        breach_id INTEGER,
+        found_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(target_id) REFERENCES targets(id),
+        FOREIGN KEY(breach_id) REFERENCES breaches(id)
+    )
+    """)
+    cur.execute("""
+        INSERT INTO email_breaches_new (id, target_id, email, breach_id, found_at)
+        SELECT e.id, e.target_id, e.email, b.id, e.found_at
+        FROM email_breaches e JOIN breaches b ON b.name = COALESCE(e.breach_name, '')
+    """)
+    cur.execute("DROP TABLE email_breaches")
+    cur.execute("ALTER TABLE email_breaches_new RENAME TO email_breaches")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_email_breaches_target ON email_breaches(target_id, found_at)")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_email_breaches_target_breach ON email_breaches(target_id, email, breach_id)")
+
+def _migration_6(cur: sqlite3.Cursor):
+    """Table clé/valeur pour l'état des synchronisations (ETag, Last-Modified, date de synchro...)."""
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sync_state (
+        key TEXT PRIMARY KEY,
+        value TEXT,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+def _migration_7(cur: sqlite3.Cursor):
+    """Résumés persistés par cible et par mode (local / llm:<modèle>), avec l'empreinte des données résumées."""
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS summaries (
+        target_id INTEGER,
+        mode TEXT,
+        content_hash TEXT,
+        watermark TEXT,
+        max_ids TEXT,
+        counts TEXT,
+        summary TEXT,
+        llm_used INTEGER,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (target_id, mode),
+        FOREIGN KEY(target_id) REFERENCES targets(id)
+    )
+    """)
+
+def _migration_8(cur: sqlite3.Cursor):
+    """Index des meilleures sources par cible (résumé local en SQL)."""
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_source_results_score ON source_results(target_id, score DESC, id)")
+
+def _migration_9(cur: sqlite3.Cursor):
+    """Clôture des cibles (purge en cascade) et index found_at pour la purge par ancienneté."""
+    if "closed_at" not in _table_columns(cur, "targets"):
+        cur.execute("ALTER TABLE targets ADD COLUMN closed_at TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_targets_closed ON targets(closed_at) WHERE closed_at IS NOT NULL")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_email_breaches_found ON email_breaches(found_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_source_results_found ON source_results(found_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_phone_lookups_found ON phone_lookups(found_at)")
+
+def _migration_10(cur: sqlite3.Cursor):
+    """Pièces jointes adressées par contenu (fichiers stockés par attachments.py) et leurs liens aux cibles."""
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS attachments (
+        sha256 TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS target_attachments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        target_id INTEGER,
+        sha256 TEXT NOT NULL,
+        kind TEXT,
+        original_name TEXT,
+        added_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(target_id) REFERENCES targets(id),
+        FOREIGN KEY(sha256) REFERENCES attachments(sha256)
+    )
+    """)
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_target_attachments ON target_attachments(target_id, sha256, kind)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_target_attachments_sha ON target_attachments(sha256)")
+
+def _migration_11(cur: sqlite3.Cursor):
+    """
+    Index plein texte FTS5 (tables à contenu externe, tenues à jour par triggers) :
+    résumés / URL des sources, et nom / titre / domaine du catalogue breaches.
+    target_id est indexé dans source_results_fts pour restreindre la recherche à une cible dans l'index même.
+    """
+    cur.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS source_results_fts USING fts5(
+        target_id, summary, url, content='source_results', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS source_results_fts_ai AFTER INSERT ON source_results BEGIN
+        INSERT INTO source_results_fts (rowid, target_id, summary, url)
+        VALUES (new.id, new.target_id, new.summary, new.url);
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS source_results_fts_ad AFTER DELETE ON source_results BEGIN
+        INSERT INTO source_results_fts (source_results_fts, rowid, target_id, summary, url)
+        VALUES ('delete', old.id, old.target_id, old.summary, old.url);
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS source_results_fts_au AFTER UPDATE OF target_id, summary, url ON source_results BEGIN
+        INSERT INTO source_results_fts (source_results_fts, rowid, target_id, summary, url)
+        VALUES ('delete', old.id, old.target_id, old.summary, old.url);
+        INSERT INTO source_results_fts (rowid, target_id, summary, url)
+        VALUES (new.id, new.target_id, new.summary, new.url);
+    END
+    """)
+    cur.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS breaches_fts USING fts5(
+        name, title, domain, content='breaches', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS breaches_fts_ai AFTER INSERT ON breaches BEGIN
+        INSERT INTO breaches_fts (rowid, name, title, domain) VALUES (new.id, new.name, new.title, new.domain);
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS breaches_fts_ad AFTER DELETE ON breaches BEGIN
+        INSERT INTO breaches_fts (breaches_fts, rowid, name, title, domain)
+        VALUES ('delete', old.id, old.name, old.title, old.domain);
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS breaches_fts_au AFTER UPDATE OF name, title, domain ON breaches BEGIN
+        INSERT INTO breaches_fts (breaches_fts, rowid, name, title, domain)
+        VALUES ('delete', old.id, old.name, old.title, old.domain);
+        INSERT INTO breaches_fts (rowid, name, title, domain) VALUES (new.id, new.name, new.title, new.domain);
+    END
+    """)
+    # breaches trouvées -> liaisons de la cible sans parcourir toutes ses adresses
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_email_breaches_breach ON email_breaches(target_id, breach_id)")
+    # (target_id, rowid) : numéro d'item d'un résultat par comptage sur un intervalle d'id
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_email_breaches_target_id ON email_breaches(target_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_source_results_target_id ON source_results(target_id)")
+    # indexation des lignes existantes
+    cur.execute("INSERT INTO source_results_fts (source_results_fts) VALUES ('rebuild')")
+    cur.execute("INSERT INTO breaches_fts (breaches_fts) VALUES ('rebuild')")
+
+def _migration_12(cur: sqlite3.Cursor):
+    """Empreinte de la partie des résumés que le delta incrémental ne transporte pas (cible, catalogue)."""
+    if "base_hash" not in _table_columns(cur, "summaries"):
+        cur.execute("ALTER TABLE summaries ADD COLUMN base_hash TEXT")
+
+# (version, description, fonction) — ordre croissant, chaque étape doit être idempotente
+MIGRATIONS = [
+    (1, "index target_id/found_at", _migration_1),
+    (2, "unicité breach par cible", _migration_2),
+    (3, "cache HIBP", _migration_3),
+    (4, "raw_json compressé", _migration_4),
+    (5, "catalogue breaches", _migration_5),
+    (6, "état de synchronisation", _migration_6),
+    (7, "résumés persistés", _migration_7),
+    (8, "index score des sources", _migration_8),
+    (9, "clôture des cibles et rétention", _migration_9),
+    (10, "pièces jointes", _migration_10),
+    (11, "index plein texte FTS5", _migration_11),
+    (12, "empreinte cible/catalogue des résumés", _migration_12),
+]
+
+def schema_version() -> int:
+    """Retourne la version de schéma appliquée (0 si aucune migration)."""
+    conn = get_conn()
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT,
+        applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def migrate() -> int:
+    """
+    Applique dans l'ordre les migrations dont la version dépasse celle de la base.
+    Chaque étape tourne dans sa propre transaction avec l'enregistrement de sa version.
+    Retourne la version finale.
+    """
+    current = schema_version()
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        with transaction() as conn:
+            step(conn.cursor())
+            conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)", (version, description))
+        current = version
+    return current
+
+# Requêtes d'insertion : texte constant pour profiter du cache de requêtes préparées
+_INSERT_TARGET_SQL = """
+    INSERT INTO targets (nom, prenom, pseudo, email, numero, localisation, alias)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+# Ajout au catalogue : une breach déjà connue n'est réécrite que pour compléter des métadonnées manquantes
+_UPSERT_BREACH_SQL = """
+    INSERT INTO breaches (name, title, breach_date, domain, raw_json)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET
+        title = excluded.title,
+        breach_date = excluded.breach_date,
+        domain = excluded.domain,
+        raw_json = excluded.raw_json,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE breaches.title IS NULL AND excluded.title IS NOT NULL
+"""
+# Synchronisation du catalogue : la liste publique fait foi, les lignes existantes sont remplacées
+_SYNC_BREACH_SQL = """
+    INSERT INTO breaches (name, title, breach_date, domain, raw_json)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET
+        title = excluded.title,
+        breach_date = excluded.breach_date,
+        domain = excluded.domain,
+        raw_json = excluded.raw_json,
+        updated_at = CURRENT_TIMESTAMP
+"""
+_INSERT_BREACH_SQL = """
+    INSERT OR IGNORE INTO email_breaches (target_id, email, breach_id)
+    SELECT ?, ?, id FROM breaches WHERE name = ?
+"""
+_INSERT_SOURCE_SQL = """
+    INSERT INTO source_results (target_id, source, type, url, score, summary, raw_json)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+_INSERT_PHONE_SQL = """
+    INSERT INTO phone_lookups (target_id, numero, e164, country, carrier, is_valid, is_possible, raw_json)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+@metrics.instrument("db.save_target")
 def save_target(data: dict) -> int:
     """
     Insère une cible dans targets. Retourne target_id.
     data: dict avec clés (nom, prenom, pseudo, email, numero, localisation, alias)
     """
+    vals = [data.get(k) for k in ("nom", "prenom", "pseudo", "email", "numero", "localisation", "alias")]
+    # localisation saisie comme {ville, pays} : stockée en JSON (sqlite3 ne lie pas un dict)
+    vals = [json.dumps(v, ensure_ascii=False) if isinstance(v, dict) else v for v in vals]
+    with transaction() as conn:
+        cur = conn.execute(_INSERT_TARGET_SQL, vals)
+        return cur.lastrowid
+
+def _breach_row(breach: dict) -> tuple:
+    """Ligne du catalogue breaches (name, title, breach_date, domain, raw_json)."""
+    raw = encode_raw(json.dumps(breach, ensure_ascii=False))
+    breach_name = breach.get("Name") or breach.get("name") or ""
+    breach_title = breach.get("Title") or breach.get("title") or None
+    breach_date = breach.get("BreachDate") or breach.get("breachDate") or None
+    breach_domain = breach.get("Domain") or breach.get("domain") or None
+    return (breach_name, breach_title, breach_date, breach_domain, raw)
+
+def _source_row(target_id: Optional[int], result: dict) -> tuple:
+    raw_text = encode_raw(json.dumps(result.get("raw"), ensure_ascii=False))
+    return (target_id, result.get("source"), result.get("type"), result.get("url"), result.get("score"), result.get("summary"), raw_text)
+
+def _phone_row(target_id: Optional[int], lookup: dict) -> tuple:
+    is_valid = lookup.get("is_valid")
+    is_possible = lookup.get("is_possible")
+    return (
+        target_id,
+        lookup.get("numero"),
+        lookup.get("e164"),
+        lookup.get("country"),
+        lookup.get("carrier"),
+        int(bool(is_valid)) if is_valid is not None else None,
+        int(bool(is_possible)) if is_possible is not None else None,
+        encode_raw(lookup.get("raw_json")),
+    )
+
+# Préparation (encodage, hors verrou) / application dans une transaction ouverte,
+# partagées par les fonctions save_* et par ResultWriter
+def _prepare_email_breaches(target_id: Optional[int], email: str, breaches: list) -> tuple:
+    catalog = {}
+    for b in breaches:
+        row = _breach_row(b)
+        catalog.setdefault(row[0], row)
+    return list(catalog.values()), [(target_id, email, name) for name in catalog]
+
+def _apply_email_breaches(conn: sqlite3.Connection, prepared: tuple) -> int:
+    catalog_rows, links = prepared
+    conn.executemany(_UPSERT_BREACH_SQL, catalog_rows)
+    return conn.executemany(_INSERT_BREACH_SQL, links).rowcount
+
+def _prepare_source_results(target_id: Optional[int], results: list) -> list:
+    return [_source_row(target_id, r) for r in results]
+
+def _apply_source_results(conn: sqlite3.Connection, rows: list) -> int:
+    conn.executemany(_INSERT_SOURCE_SQL, rows)
+    return len(rows)
+
+def _prepare_phone_lookups(target_id: Optional[int], lookups: list) -> list:
+    return [_phone_row(target_id, l) for l in lookups]
+
+def _apply_phone_lookups(conn: sqlite3.Connection, rows: list) -> int:
+    conn.executemany(_INSERT_PHONE_SQL, rows)
+    return len(rows)
+
+# ----------------------
+# Insertions en lot (une transaction, tout ou rien)
+# ----------------------
+@metrics.instrument("db.save_email_breaches")
+def save_email_breaches(target_id: Optional[int], email: str, breaches: list) -> int:
+    """
+    Sauvegarde toutes les breaches (format HIBP) d'un email en une seule transaction :
+    les métadonnées vont une seule fois dans le catalogue breaches, email_breaches ne reçoit
+    que la liaison (cible, email, breach). Les liaisons déjà existantes sont ignorées.
+    Retourne le nombre de liaisons réellement insérées.
+    """
+    prepared = _prepare_email_breaches(target_id, email, breaches)
+    if not prepared[1]:
+        return 0
+    with transaction() as conn:
+        return _apply_email_breaches(conn, prepared)
+
+@metrics.instrument("db.save_breach_catalog")
+def save_breach_catalog(breaches: list) -> int:
+    """Remplace/ajoute en une transaction les breaches de la liste complète HIBP dans le catalogue."""
+    rows = [_breach_row(b) for b in breaches]
+    rows = [r for r in rows if r[0]]
+    if not rows:
+        return 0
+    with transaction() as conn:
+        conn.executemany(_SYNC_BREACH_SQL, rows)
+    return len(rows)
+
+def fetch_breach_catalog(names: list) -> dict:
+    """Retourne {nom: objet breach complet (raw décodé)} pour les noms présents dans le catalogue."""
     conn = get_conn()
-    cur = conn.cursor()
-    keys = []
-    vals = []
-    for k in ("nom", "prenom", "pseudo", "email", "numero", "localisation", "alias"):
-        keys.append(k)
-        vals.append(data.get(k))
-    q_keys = ", ".join(keys)
-    placeholders = ", ".join(["?"] * len(vals))
-    cur.execute(f"INSERT INTO targets ({q_keys}) VALUES ({placeholders})", vals)
-    target_id = cur.lastrowid
-    conn.commit()
-    conn.close()
-    return target_id
+    found = {}
+    names = list(names)
+    for i in range(0, len(names), 500):
+        chunk = names[i:i + 500]
+        placeholders = ", ".join(["?"] * len(chunk))
+        for name, title, raw in conn.execute(
+                f"SELECT name, title, raw_json FROM breaches WHERE name IN ({placeholders})", chunk):
+            if title is not None:
+                found[name] = load_raw(raw)
+    return found
+
+def get_sync_state(key: str) -> Optional[str]:
+    row = get_conn().execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def set_sync_state(values: dict):
+    """Enregistre plusieurs clés de sync_state en une transaction (None supprime la clé)."""
+    with transaction() as conn:
+        for key, value in values.items():
+            if value is None:
+                conn.execute("DELETE FROM sync_state WHERE key = ?", (key,))
+            else:
+                conn.execute("""
+                    INSERT INTO sync_state (key, value) VALUES (?, ?)
+                    ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP
+                """, (key, str(value)))
 
+@metrics.instrument("db.save_attachment")
+def save_attachment(target_id: Optional[int], sha256: str, size: int, kind: Optional[str] = None,
+                    original_name: Optional[str] = None) -> bool:
+    """
+    Enregistre un fichier stocké (hash + taille) et son lien à la cible, en une transaction.
+    Retourne False si ce fichier était déjà rattaché à la cible pour ce kind.
+    """
+    with transaction() as conn:
+        conn.execute("INSERT OR IGNORE INTO attachments (sha256, size) VALUES (?, ?)", (sha256, size))
+        cur = conn.execute("""
+            INSERT OR IGNORE INTO target_attachments (target_id, sha256, kind, original_name)
+            VALUES (?, ?, ?, ?)
+        """, (target_id, sha256, kind, original_name))
+    return cur.rowcount > 0
+
+def fetch_target_attachments(target_id: int) -> list:
+    """Pièces jointes d'une cible : [{"sha256", "size", "kind", "original_name", "added_at"}]."""
+    rows = get_conn().execute("""
+        SELECT t.sha256, a.size, t.kind, t.original_name, t.added_at
+        FROM target_attachments t JOIN attachments a ON a.sha256 = t.sha256
+        WHERE t.target_id = ? ORDER BY t.id
+    """, (target_id,)).fetchall()
+    return [dict(zip(("sha256", "size", "kind", "original_name", "added_at"), r)) for r in rows]
+
+def get_summary(target_id: int, mode: str) -> Optional[dict]:
+    """Dernier résumé enregistré pour (target_id, mode), ou None."""
+    row = get_conn().execute("""
+        SELECT content_hash, watermark, max_ids, counts, summary, llm_used, created_at, base_hash
+        FROM summaries WHERE target_id = ? AND mode = ?
+    """, (target_id, mode)).fetchone()
+    if not row:
+        return None
+    return {
+        "content_hash": row[0],
+        "watermark": row[1],
+        "max_ids": json.loads(row[2]) if row[2] else {},
+        "counts": json.loads(row[3]) if row[3] else {},
+        "summary": row[4],
+        "llm_used": bool(row[5]),
+        "created_at": row[6],
+        "base_hash": row[7],
+    }
+
+@metrics.instrument("db.save_summary")
+def save_summary(target_id: int, mode: str, content_hash: str, watermark: Optional[str],
+                 max_ids: dict, counts: dict, summary: str, llm_used: bool, base_hash: Optional[str] = None):
+    with transaction() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO summaries (target_id, mode, content_hash, watermark, max_ids, counts, summary, llm_used,
+                                              base_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (target_id, mode, content_hash, watermark, json.dumps(max_ids), json.dumps(counts), summary, int(llm_used),
+              base_hash))
+
+@metrics.instrument("db.save_source_results")
+def save_source_results(target_id: Optional[int], results: list) -> int:
+    """
+    Sauvegarde plusieurs résultats de sources en une seule transaction.
+    results: dicts avec clés (source, type, url, score, summary, raw).
+    """
+    rows = _prepare_source_results(target_id, results)
+    if not rows:
+        return 0
+    with transaction() as conn:
+        return _apply_source_results(conn, rows)
+
+@metrics.instrument("db.save_phone_lookups")
+def save_phone_lookups(target_id: Optional[int], lookups: list) -> int:
+    """
+    Sauvegarde plusieurs lookups téléphone en une seule transaction.
+    lookups: dicts avec clés (numero, e164, country, carrier, is_valid, is_possible, raw_json).
+    """
+    rows = _prepare_phone_lookups(target_id, lookups)
+    if not rows:
+        return 0
+    with transaction() as conn:
+        return _apply_phone_lookups(conn, rows)
+
+# ----------------------
+# Insertions unitaires (enveloppes des fonctions en lot)
+# ----------------------
 def save_email_breach(target_id: Optional[int], email: str, breach: dict):
     """
     Sauvegarde une entrée breach (format HIBP) dans email_breaches.
     breach: dict contenant au moins 'Name', 'Title', 'BreachDate', 'Domain' ou raw JSON.
     """
-    conn = get_conn()
-    cur = conn.cursor()
-    raw = json.dumps(breach, ensure_ascii=False)
-    breach_name = breach.get("Name") or breach.get("name") or None
-    breach_title = breach.get("Title") or breach.get("title") or None
-    breach_date = breach.get("BreachDate") or breach.get("breachDate") or None
-    breach_domain = breach.get("Domain") or breach.get("domain") or None
-
-    cur.execute("""
-        INSERT INTO email_breaches (target_id, email, breach_name, breach_title, breach_date, breach_domain, raw_json)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (target_id, email, breach_name, breach_title, breach_date, breach_domain, raw))
-    conn.commit()
-    conn.close()
+    save_email_breaches(target_id, email, [breach])
 
 def save_source_result(target_id: Optional[int], source: str, type_: str, url: str, score: float, summary: str, raw: dict):
-    conn = get_conn()
-    cur = conn.cursor()
-    raw_text = json.dumps(raw, ensure_ascii=False)
-    cur.execute("""
-        INSERT INTO source_results (target_id, source, type, url, score, summary, raw_json)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (target_id, source, type_, url, score, summary, raw_text))
-    conn.commit()
-    conn.close()
+    save_source_results(target_id, [{"source": source, "type": type_, "url": url, "score": score, "summary": summary, "raw": raw}])
 
 
 def save_phone_lookup(target_id: Optional[int], numero: str, e164: Optional[str], country: Optional[str], carrier: Optional[str], is_valid: Optional[bool], is_possible: Optional[bool], raw_json: str):
@@ -133,11 +762,155 @@ def save_phone_lookup(target_id: Optional[int], numero: str, e164: Optional[str]
     Sauvegarde un résultat de lookup téléphone.
     raw_json : chaîne JSON (string) contenant le détail / hits web si besoin.
     """
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO phone_lookups (target_id, numero, e164, country, carrier, is_valid, is_possible, raw_json)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (target_id, numero, e164, country, carrier, int(bool(is_valid)) if is_valid is not None else None, int(bool(is_possible)) if is_possible is not None else None, raw_json))
-    conn.commit()
-    conn.close()
+    save_phone_lookups(target_id, [{
+        "numero": numero,
+        "e164": e164,
+        "country": country,
+        "carrier": carrier,
+        "is_valid": is_valid,
+        "is_possible": is_possible,
+        "raw_json": raw_json,
+    }])
+
+
+# ----------------------
+# Écriture différée (write-behind)
+# ----------------------
+# Seuils de vidage du ResultWriter : nombre d'écritures en attente / délai depuis la première
+WRITER_BATCH_SIZE = 200
+WRITER_FLUSH_INTERVAL = 0.2  # secondes
+
+_FLUSH = object()
+_STOP = object()
+
+
+class WriteError(Exception):
+    """Une ou plusieurs écritures différées ont échoué ; `errors` contient les exceptions d'origine."""
+
+    def __init__(self, errors: List[BaseException]):
+        super().__init__(f"{len(errors)} écriture(s) en échec : {errors[0]}")
+        self.errors = errors
+
+
+class ResultWriter:
+    """
+    File d'écriture différée : les modules déposent leurs résultats (save_*) sans attendre SQLite,
+    un thread unique les enregistre par lots, une transaction par lot, dès que `batch_size`
+    écritures attendent ou `flush_interval` secondes après la première.
+    Chaque save_* retourne un Future (nombre de lignes insérées, ou l'exception d'écriture).
+    flush() attend que tout ce qui a été déposé soit commité et relève WriteError si des
+    écritures ont échoué depuis le flush précédent ; close() vide la file puis arrête le thread.
+    """
+
+    def __init__(self, batch_size: int = WRITER_BATCH_SIZE, flush_interval: float = WRITER_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue()
+        self._errors: List[BaseException] = []
+        self._errors_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def _submit(self, apply, prepared) -> Future:
+        if self._closed:
+            raise RuntimeError("ResultWriter fermé")
+        fut: Future = Future()
+        self._queue.put((apply, prepared, fut))
+        return fut
+
+    def save_email_breaches(self, target_id: Optional[int], email: str, breaches: list) -> Future:
+        """Comme db.save_email_breaches ; le Future donne le nombre de liaisons insérées."""
+        return self._submit(_apply_email_breaches, _prepare_email_breaches(target_id, email, breaches))
+
+    def save_source_results(self, target_id: Optional[int], results: list) -> Future:
+        return self._submit(_apply_source_results, _prepare_source_results(target_id, results))
+
+    def save_phone_lookups(self, target_id: Optional[int], lookups: list) -> Future:
+        return self._submit(_apply_phone_lookups, _prepare_phone_lookups(target_id, lookups))
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP or isinstance(item, threading.Event):
+                self._write(batch)
+                batch, deadline = [], None
+                if item is _STOP:
+                    return
+                item.set()  # barrière de flush()
+                continue
+            if item is not None:
+                batch.append(item)
+                deadline = deadline or time.monotonic() + self.flush_interval
+            if batch and (item is None or len(batch) >= self.batch_size):
+                self._write(batch)
+                batch, deadline = [], None
+
+    def _write(self, batch: list):
+        if not batch:
+            return
+        try:
+            with metrics.span("db.writer_batch"), transaction() as conn:
+                counts = [apply(conn, prepared) for apply, prepared, _ in batch]
+        except Exception:
+            # lot annulé : chaque écriture est rejouée seule pour isoler celle(s) en échec ;
+            # le Future n'est résolu qu'une fois le COMMIT passé
+            for apply, prepared, fut in batch:
+                try:
+                    with transaction() as conn:
+                        count = apply(conn, prepared)
+                except Exception as e:
+                    with self._errors_lock:
+                        self._errors.append(e)
+                    fut.set_exception(WriteError([e]))
+                    continue
+                fut.set_result(count)
+            return
+        metrics.incr("db.writer_items", len(batch))
+        for (_, _, fut), count in zip(batch, counts):
+            fut.set_result(count)
+
+    def flush(self, timeout: Optional[float] = None):
+        """Attend que toutes les écritures déposées soient commitées ; relève WriteError en cas d'échec."""
+        if self._thread.is_alive():
+            barrier = threading.Event()
+            self._queue.put(barrier)
+            if not barrier.wait(timeout):
+                raise TimeoutError("flush du ResultWriter non terminé dans le délai")
+        with self._errors_lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise WriteError(errors)
+
+    def close(self, timeout: Optional[float] = None):
+        """Vide la file, arrête le thread d'écriture et relève WriteError si des écritures ont échoué."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            # dépôts concurrents arrivés après l'arrêt : jamais écrits
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, tuple):
+                    item[2].set_exception(RuntimeError("ResultWriter fermé"))
+                elif isinstance(item, threading.Event):
+                    item.set()
+        with self._errors_lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise WriteError(errors)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,72 +1,193 @@
 import os
-import requests
+import sys
+import hashlib
+import json
+import threading
 import time
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 import db
+import breach_catalog
+import metrics
+
+# requests (via hibp_client) n'est importé qu'au premier vrai appel réseau : un hit de cache n'en a pas besoin
+if TYPE_CHECKING:
+    from hibp_client import HibpClient
 
-# HIBP endpoint (breached account)
-HIBP_URL = "https://haveibeenpwned.com/api/v3/breachedaccount/{}"
 # NOTE: HIBP requires an API key (hibp-api-key header). Place it in env var HIBP_API_KEY.
 
+# Cache des réponses HIBP (table hibp_cache) : durées en secondes
+HIBP_CACHE_TTL = int(os.environ.get("HIBP_CACHE_TTL", str(24 * 3600)))
+HIBP_CACHE_NEGATIVE_TTL = int(os.environ.get("HIBP_CACHE_NEGATIVE_TTL", str(6 * 3600)))  # réponses 404 (aucune breach)
+HIBP_CACHE_MAX_ENTRIES = int(os.environ.get("HIBP_CACHE_MAX_ENTRIES", "10000"))
+
+# Modes de cache acceptés par search_email ; HIBP_CACHE_MODE est le mode par défaut
+CACHE_MODES = ("use", "refresh", "bypass")
+HIBP_CACHE_MODE = os.environ.get("HIBP_CACHE_MODE", "use")
+
+CACHE_STATS = {"hits": 0, "negative_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
 def _get_hibp_api_key() -> Optional[str]:
     return os.environ.get("HIBP_API_KEY")
 
-def _call_hibp(email: str, truncate_response=True):
+_client: Optional["HibpClient"] = None
+
+def get_client() -> "HibpClient":
+    """Client HIBP partagé du process (session keep-alive + limiteur de débit)."""
+    global _client
+    if _client is None:
+        from hibp_client import HibpClient
+        _client = HibpClient(api_key=_get_hibp_api_key())
+    return _client
+
+def set_client(client: Optional["HibpClient"]):
+    """Remplace le client partagé (ex. client branché sur une cassette) ; l'ancien est fermé."""
+    global _client
+    if _client is not None and _client is not client:
+        _client.close()
+    _client = client
+
+def _is_http_error(exc: Exception) -> bool:
+    requests = sys.modules.get("requests")
+    return requests is not None and isinstance(exc, requests.HTTPError)
+
+def _is_cancelled(exc: Exception) -> bool:
+    hibp_client = sys.modules.get("hibp_client")
+    return hibp_client is not None and isinstance(exc, hibp_client.RequestCancelled)
+
+@metrics.instrument("hibp.call")
+def _call_hibp(email: str, truncate_response=True, client: Optional["HibpClient"] = None,
+               cancel: Optional[threading.Event] = None):
     """
     Appelle l'API HIBP. Retourne la JSON list of breaches or raises.
     Attention: l'API peut renvoyer 404 si pas de breach et 200 avec liste sinon.
+    Le débit (1 requête / 1,5 s) et les relances sur 429 sont gérés par HibpClient.
     """
-    api_key = _get_hibp_api_key()
-    if not api_key:
+    client = client or get_client()
+    if not client.api_key:
         return {"error": "no_api_key", "message": "Aucune clé HIBP fournie (HIBP_API_KEY)."}
+    return client.breached_account(email, truncate_response=truncate_response, cancel=cancel)
+
+# ----------------------
+# Cache HIBP
+# ----------------------
+def _cache_key(email: str, truncate_response: bool = True) -> str:
+    normalized = email.strip().lower()
+    return hashlib.sha256(f"{normalized}|{int(bool(truncate_response))}".encode("utf-8")).hexdigest()
 
-    headers = {
-        "hibp-api-key": api_key,
-        "user-agent": "ShadowHunter/1.0",
-        "accept": "application/json"
-    }
-    url = HIBP_URL.format(requests.utils.requote_uri(email))
-    resp = requests.get(url, headers=headers, params={"truncateResponse": str(truncate_response).lower()})
-    # Respecter la rate limit: HIBP demande 1 request per 1.5s (voir docs) -> backoff simple
-    if resp.status_code == 429:
-        # rate limited: read Retry-After header if présent
-        retry = int(resp.headers.get("Retry-After", "2"))
-        time.sleep(retry)
-        return _call_hibp(email, truncate_response)
-    if resp.status_code == 404:
-        return []  # no breaches for this account
-    resp.raise_for_status()
-    return resp.json()
-
-def search_email(email: str, target_id: Optional[int] = None, save: bool = True) -> dict:
+def _cache_get(key: str) -> Optional[list]:
+    """Retourne la liste de breaches en cache, ou None si absente / expirée."""
+    conn = db.get_conn()
+    row = conn.execute("SELECT status, body, fetched_at FROM hibp_cache WHERE key = ?", (key,)).fetchone()
+    if row:
+        status, body, fetched_at = row
+        ttl = HIBP_CACHE_NEGATIVE_TTL if status == 404 else HIBP_CACHE_TTL
+        if time.time() - fetched_at < ttl:
+            with db.transaction() as c:
+                c.execute("UPDATE hibp_cache SET hits = hits + 1 WHERE key = ?", (key,))
+            CACHE_STATS["negative_hits" if status == 404 else "hits"] += 1
+            metrics.incr("hibp.cache_hits")
+            return json.loads(body) if body else []
+    CACHE_STATS["misses"] += 1
+    metrics.incr("hibp.cache_misses")
+    return None
+
+def _cache_put(key: str, breaches: list):
+    """Enregistre une réponse (liste vide = 404) puis évince les entrées les plus anciennes au-delà de la limite."""
+    status = 200 if breaches else 404
+    body = json.dumps(breaches, ensure_ascii=False) if breaches else None
+    with db.transaction() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO hibp_cache (key, status, body, fetched_at, hits)
+            VALUES (?, ?, ?, ?, 0)
+        """, (key, status, body, time.time()))
+        count = conn.execute("SELECT COUNT(*) FROM hibp_cache").fetchone()[0]
+        excess = count - HIBP_CACHE_MAX_ENTRIES
+        if excess > 0:
+            conn.execute("""
+                DELETE FROM hibp_cache WHERE key IN (
+                    SELECT key FROM hibp_cache ORDER BY fetched_at LIMIT ?
+                )
+            """, (excess,))
+            CACHE_STATS["evictions"] += excess
+    CACHE_STATS["stores"] += 1
+
+def cache_stats() -> dict:
+    """Compteurs du cache HIBP pour ce process, plus le nombre d'entrées stockées."""
+    stats = dict(CACHE_STATS)
+    stats["entries"] = db.get_conn().execute("SELECT COUNT(*) FROM hibp_cache").fetchone()[0]
+    return stats
+
+def _lookup_hibp(email: str, cache: str = "use", cancel: Optional[threading.Event] = None):
+    """
+    _call_hibp avec cache. cache: 'use' (lit puis écrit), 'refresh' (ignore la lecture, écrit),
+    'bypass' (ni lecture ni écriture). Retourne (résultat, depuis_cache).
+    """
+    key = _cache_key(email)
+    if cache == "use":
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached, True
+    res = _call_hibp(email, truncate_response=True, cancel=cancel)
+    if cache != "bypass" and isinstance(res, list):
+        _cache_put(key, res)
+    return res, False
+
+def _enrich_from_catalog(breaches: list, notes: list, cancel: Optional[threading.Event] = None) -> list:
+    """Synchro périodique du catalogue local puis enrichissement de la réponse tronquée."""
+    try:
+        breach_catalog.sync_breach_catalog(cancel=cancel)
+    except Exception as e:
+        notes.append(f"Synchro du catalogue de breaches impossible: {e}")
+    return breach_catalog.enrich_breaches(breaches, cancel=cancel)
+
+def search_email(email: str, target_id: Optional[int] = None, save: bool = True, cache: Optional[str] = None,
+                 writer: Optional[db.ResultWriter] = None, cancel: Optional[threading.Event] = None) -> dict:
     """
     Lance des recherches OSINT liées à un email.
     - HIBP (si clé)
     - placeholder pour d'autres recherches (pastebins, dorks...) à ajouter plus tard.
 
     Sauvegarde les résultats en DB si save=True.
+    cache: 'use' | 'refresh' | 'bypass' (voir _lookup_hibp), HIBP_CACHE_MODE par défaut.
+    writer: db.ResultWriter optionnel ; l'enregistrement est alors déposé dans sa file sans attendre
+    le commit, et le Future correspondant est retourné sous 'pending_writes'.
+    cancel: Event optionnel ; levé, il interrompt les attentes HIBP (débit, relances) et rien n'est sauvegardé.
     Retour: dict résumé avec clefs 'hibp' etc.
     """
+    cache = cache or HIBP_CACHE_MODE
+    if cache not in CACHE_MODES:
+        raise ValueError(f"cache doit valoir l'un de {CACHE_MODES}")
     results = {"email": email, "hibp": None, "notes": []}
 
     # HIBP
     try:
-        hibp_res = _call_hibp(email)
+        hibp_res, from_cache = _lookup_hibp(email, cache, cancel)
+        if from_cache:
+            results["notes"].append("Réponse HIBP servie depuis le cache.")
         if isinstance(hibp_res, dict) and hibp_res.get("error") == "no_api_key":
             results["notes"].append("HIBP API key non fournie; pas de requête HIBP.")
         else:
-            # hibp_res is a list (possibly empty)
+            # hibp_res is a list (possibly empty) of truncated entries: enrich them from the local catalog
+            if hibp_res:
+                hibp_res = _enrich_from_catalog(hibp_res, results["notes"], cancel)
             results["hibp"] = hibp_res
-            if save and hibp_res:
-                for breach in hibp_res:
-                    db.save_email_breach(target_id, email, breach)
-                results["notes"].append(f"{len(hibp_res)} breach(es) sauvegardée(s).")
+            if cancel is not None and cancel.is_set():
+                results["notes"].append("Recherche HIBP annulée.")
+            elif save and hibp_res and writer is not None:
+                results["pending_writes"] = [writer.save_email_breaches(target_id, email, hibp_res)]
+                results["notes"].append(f"{len(hibp_res)} breach(es) trouvée(s), sauvegarde différée.")
+            elif save and hibp_res:
+                saved = db.save_email_breaches(target_id, email, hibp_res)
+                results["notes"].append(f"{len(hibp_res)} breach(es) trouvée(s), {saved} nouvelle(s) sauvegardée(s).")
             elif save:
                 results["notes"].append("Aucun breach trouvé (HIBP).")
-    except requests.HTTPError as e:
-        results["notes"].append(f"Erreur HTTP HIBP: {e}")
     except Exception as e:
-        results["notes"].append(f"Erreur HIBP inattendue: {e}")
+        if _is_cancelled(e):
+            results["notes"].append("Recherche HIBP annulée.")
+        elif _is_http_error(e):
+            results["notes"].append(f"Erreur HTTP HIBP: {e}")
+        else:
+            results["notes"].append(f"Erreur HIBP inattendue: {e}")
 
     # TODO: ajouter ici d'autres sources (pastebin scrapers, google dorks, leaks archives)
     # Exemple d'enregistrement générique dans source_results si tu veux tracer un événement :
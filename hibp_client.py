@@ -0,0 +1,242 @@
+# hibp_client.py
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+# Base de l'API HIBP v3 (surchargeable pour pointer vers un serveur local de test)
+HIBP_BASE_URL = os.environ.get("HIBP_BASE_URL", "https://haveibeenpwned.com/api/v3")
+# Débit documenté par HIBP pour la clé de base : 1 requête / 1,5 s
+HIBP_RATE_PER_MIN = float(os.environ.get("HIBP_RATE_PER_MIN", "40"))
+
+DEFAULT_TIMEOUT = (3.05, 15)  # (connect, read) en secondes
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class RequestCancelled(Exception):
+    """Attente (limiteur, backoff) interrompue par l'Event d'annulation de l'appelant."""
+
+
+class TokenBucket:
+    """
+    Limiteur de débit à jetons : `rate` jetons par seconde, au plus `capacity` en réserve.
+    acquire() bloque jusqu'à disposer d'un jeton et retourne le temps attendu ; avec un Event
+    `cancel`, l'attente se fait sur cet Event et relève RequestCancelled dès qu'il est levé.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, cancel: Optional[threading.Event] = None) -> float:
+        waited = 0.0
+        with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                delay = (1 - self.tokens) / self.rate
+                if cancel is None:
+                    self._sleep(delay)
+                elif cancel.wait(delay):
+                    raise RequestCancelled("requête HIBP annulée")
+                waited += delay
+                self._refill()
+            self.tokens -= 1
+        return waited
+
+    def penalize(self, seconds: float):
+        """Bloque les prochains acquire() pendant au moins `seconds` (backoff, Retry-After)."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class CassetteMiss(LookupError):
+    """Requête absente de la cassette rejouée."""
+
+
+class Cassette:
+    """
+    Réponses HTTP enregistrées dans un fichier JSON, pour rejouer un run sans réseau.
+    - mode "record" : chaque réponse finale de HibpClient.get est ajoutée (save() écrit le fichier)
+    - mode "replay" : les réponses sont servies dans l'ordre d'enregistrement pour une même requête
+      (la dernière est resservie ensuite) ; une requête inconnue relève CassetteMiss.
+    Clé d'une requête : "GET <chemin>?<paramètres triés>" (ni clé d'API ni en-têtes conditionnels).
+    """
+
+    MODES = ("record", "replay")
+    # en-têtes conservés (les autres ne sont pas lus par le code)
+    KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Retry-After")
+
+    def __init__(self, path: str, mode: str):
+        if mode not in self.MODES:
+            raise ValueError(f"mode doit valoir l'un de {self.MODES}")
+        self.path = path
+        self.mode = mode
+        self.entries: Dict[str, List[dict]] = {}
+        self._played: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if mode == "replay":
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)["entries"]
+
+    @staticmethod
+    def key(method: str, path: str, params: Optional[dict] = None) -> str:
+        query = urlencode(sorted((params or {}).items()))
+        return f"{method} {path}?{query}" if query else f"{method} {path}"
+
+    def record(self, key: str, resp):
+        entry = {
+            "status": resp.status_code,
+            "headers": {k: resp.headers[k] for k in self.KEPT_HEADERS if k in resp.headers},
+            "body": resp.text,
+        }
+        with self._lock:
+            self.entries.setdefault(key, []).append(entry)
+
+    def play(self, key: str, url: str):
+        with self._lock:
+            recorded = self.entries.get(key)
+            if not recorded:
+                raise CassetteMiss(f"Aucune réponse enregistrée pour {key}")
+            n = self._played.get(key, 0)
+            self._played[key] = n + 1
+            entry = recorded[min(n, len(recorded) - 1)]
+        resp = requests.Response()
+        resp.status_code = entry["status"]
+        resp.headers.update(entry["headers"])
+        resp._content = entry["body"].encode("utf-8")
+        resp.encoding = "utf-8"
+        resp.url = url
+        return resp
+
+    def save(self):
+        if self.mode != "record":
+            return
+        with self._lock:
+            text = json.dumps({"entries": self.entries}, ensure_ascii=False, indent=1, sort_keys=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+class HibpClient:
+    """
+    Client HTTP réutilisable pour HIBP : session requests avec pool keep-alive, timeouts
+    connect/read, limiteur à jetons et relances itératives bornées (backoff exponentiel
+    avec jitter, Retry-After respecté).
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: str = HIBP_BASE_URL,
+                 rate_per_min: float = HIBP_RATE_PER_MIN, timeout=DEFAULT_TIMEOUT,
+                 max_retries: int = 4, backoff_base: float = 1.0, backoff_max: float = 30.0,
+                 pool_size: int = 4, user_agent: str = "ShadowHunter/1.0", cassette: Optional[Cassette] = None):
+        self.api_key = api_key
+        self.cassette = cassette
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(rate_per_min / 60.0)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"user-agent": user_agent, "accept": "application/json"})
+        if api_key:
+            self.session.headers["hibp-api-key"] = api_key
+
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _retry_after(resp) -> Optional[float]:
+        value = resp.headers.get("Retry-After")
+        try:
+            return max(0.0, float(value)) if value is not None else None
+        except ValueError:
+            return None
+
+    def get(self, path: str, params: Optional[dict] = None, headers: Optional[dict] = None,
+            cancel: Optional[threading.Event] = None):
+        """
+        GET sur base_url + path. Relance (au plus max_retries fois) sur 429/5xx et erreurs
+        réseau ; retourne la dernière réponse obtenue, ou relève la dernière erreur réseau.
+        cancel : Event consulté entre les tentatives et pendant les attentes (RequestCancelled).
+        """
+        url = self.base_url + path
+        if self.cassette is not None:
+            key = Cassette.key("GET", path, params)
+            if self.cassette.mode == "replay":
+                # ni réseau ni limiteur : un run rejoué est déterministe et ne dépend que de la cassette
+                return self.cassette.play(key, url)
+        for attempt in range(self.max_retries + 1):
+            if cancel is not None and cancel.is_set():
+                raise RequestCancelled("requête HIBP annulée")
+            # attente du limiteur (débit + backoff) mesurée à part de la latence HTTP
+            metrics.observe("hibp.rate_limit_wait", self.bucket.acquire(cancel))
+            if attempt:
+                metrics.incr("hibp.retries")
+            try:
+                with metrics.span("hibp.http"):
+                    resp = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                metrics.incr("hibp.network_errors")
+                if attempt == self.max_retries:
+                    raise
+                self.bucket.penalize(self._backoff(attempt))
+                continue
+            if resp.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                if self.cassette is not None:
+                    self.cassette.record(key, resp)
+                return resp
+            # l'attente passe par le limiteur : les autres appels partageant le client la respectent aussi
+            self.bucket.penalize(self._backoff(attempt, self._retry_after(resp)))
+
+    def breached_account(self, email: str, truncate_response: bool = True,
+                         cancel: Optional[threading.Event] = None) -> list:
+        """Liste des breaches d'un compte ([] si 404). Relève requests.HTTPError sinon."""
+        path = "/breachedaccount/" + requests.utils.quote(email, safe="")
+        resp = self.get(path, params={"truncateResponse": str(truncate_response).lower()}, cancel=cancel)
+        if resp.status_code == 404:
+            return []
+        resp.raise_for_status()
+        return resp.json()
+
+    def all_breaches(self, etag: Optional[str] = None, last_modified: Optional[str] = None,
+                     cancel: Optional[threading.Event] = None):
+        """
+        Liste publique complète des breaches (pas de clé requise), en GET conditionnel.
+        Retourne la réponse brute : 304 si rien n'a changé depuis etag / last_modified.
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        resp = self.get("/breaches", headers=headers, cancel=cancel)
+        if resp.status_code != 304:
+            resp.raise_for_status()
+        return resp
+
+    def close(self):
+        self.session.close()
@@ -1,49 +1,120 @@
+
 import re
 
-def get_nom():
+EMAIL_REGEX = r'^[\w\.-]+@[\w\.-]+\.\w+$'
+
+# ----------------------
+# Validation (sans saisie) : retourne la valeur retenue ou relève ValueError avec le message affiché
+# ----------------------
+def check_nom(nom) -> str:
+    if isinstance(nom, str) and nom.isalpha():
+        return nom
+    raise ValueError("Le nom doit contenir uniquement des lettres.")
+
+def check_prenom(prenom) -> str:
+    if isinstance(prenom, str) and prenom.isalpha():
+        return prenom
+    raise ValueError("Le prénom doit contenir uniquement des lettres.")
+
+def check_pseudo(pseudo) -> str:
+    if isinstance(pseudo, str):
+        return pseudo
+    raise ValueError("Le pseudo doit être une chaîne de caractères.")
+
+def check_email(email) -> str:
+    if isinstance(email, str) and re.match(EMAIL_REGEX, email):
+        return email
+    raise ValueError("Veuillez entrer une adresse email valide.")
+
+def check_numero(numero) -> str:
+    # un numéro venant d'un fichier JSON / TOML peut être un entier
+    numero = str(numero) if isinstance(numero, int) and not isinstance(numero, bool) else numero
+    if isinstance(numero, str) and numero.isdigit():
+        return numero  # <-- retourne une string
+    raise ValueError("Le numéro doit contenir uniquement des chiffres.")
+
+def check_photo(chemin) -> str:
+    # retourne le chemin : le fichier est stocké (en flux) par attachments.add_attachment une fois la cible créée
+    if not isinstance(chemin, str):
+        raise ValueError("Le chemin de la photo doit être une chaîne de caractères.")
+    chemin = chemin.strip()
+    try:
+        with open(chemin, "rb"):
+            pass
+    except Exception as e:
+        raise ValueError(f"Erreur lors de la lecture de la photo : {e}")
+    return chemin
+
+def check_localisation(localisation) -> dict:
+    if isinstance(localisation, dict) and all(isinstance(localisation.get(k, ""), str) for k in ("ville", "pays")):
+        return {"ville": localisation.get("ville", ""), "pays": localisation.get("pays", "")}
+    raise ValueError("La localisation doit être de la forme {ville, pays}.")
+
+# champ -> validateur, dans l'ordre du menu de saisie
+CHECKS = {
+    "nom": check_nom,
+    "prenom": check_prenom,
+    "pseudo": check_pseudo,
+    "email": check_email,
+    "numero": check_numero,
+    "photo": check_photo,
+    "localisation": check_localisation,
+}
+
+def validate_target(spec: dict) -> dict:
+    """
+    Valide un dict de champs (fichier de spec) avec les mêmes règles que la saisie.
+    Retourne les valeurs retenues ; relève ValueError listant tous les champs invalides ou inconnus.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("La cible doit être un objet {champ: valeur}.")
+    data, errors = {}, []
+    for key, value in spec.items():
+        check = CHECKS.get(key)
+        if check is None:
+            errors.append(f"{key} : champ inconnu (attendus : {', '.join(CHECKS)})")
+            continue
+        try:
+            data[key] = check(value)
+        except ValueError as e:
+            errors.append(f"{key} : {e}")
+    if errors:
+        raise ValueError("\n".join(errors))
+    return data
+
+# ----------------------
+# Saisie interactive
+# ----------------------
+def _ask(prompt: str, check):
     while True:
-        nom = input("Entrez le nom de la cible : ")
-        if nom.isalpha():
-            return nom
-        print("Le nom doit contenir uniquement des lettres.")
+        try:
+            return check(input(prompt))
+        except ValueError as e:
+            print(e)
+
+def get_nom():
+    return _ask("Entrez le nom de la cible : ", check_nom)
 
 def get_prenom():
-    while True:
-        prenom = input("Entrez le prénom de la cible : ")
-        if prenom.isalpha():
-            return prenom
-        print("Le prénom doit contenir uniquement des lettres.")
+    return _ask("Entrez le prénom de la cible : ", check_prenom)
 
 def get_pseudo():
     return input("Entrez le pseudo de la cible : ")
 
 def get_email():
-    regex = r'^[\w\.-]+@[\w\.-]+\.\w+$'
-    while True:
-        email = input("Entrez l'email de la cible : ")
-        if re.match(regex, email):
-            return email
-        print("Veuillez entrer une adresse email valide.")
+    return _ask("Entrez l'email de la cible : ", check_email)
 
 def get_numero():
-    while True:
-        numero = input("Entrez le numéro de téléphone du cible : ")
-        if numero.isdigit():
-            return numero  # <-- retourne une string
-        print("Le numéro doit contenir uniquement des chiffres.")
+    return _ask("Entrez le numéro de téléphone du cible : ", check_numero)
 
 def get_photo():
-    chemin = input("Entrez le chemin vers la photo de la cible : ")
     try:
-        with open(chemin, "rb") as f:
-            photo = f.read()
-        return photo
-    except Exception as e:
-        print("Erreur lors de la lecture de la photo :", e)
+        return check_photo(input("Entrez le chemin vers la photo de la cible : "))
+    except ValueError as e:
+        print(e)
         return None
 
 def get_localisation():
     ville = input("Entrez la ville de la cible : ")
     pays = input("Entrez le pays de la cible : ")
     return {"ville": ville, "pays": pays}
-
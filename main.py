@@ -1,9 +1,16 @@
+import argparse
+import json
+from typing import Optional
+
 import db
+import metrics
 import ingest_stand
 import alias_combination
-import email_search as email_module
-import time
-import telephone_search as phone_module
+import attachments
+import orchestrator
+
+# Durée maximale (secondes) d'un run complet de modules
+RUN_DEADLINE = 300
 
 
 def collect_inputs():
@@ -43,11 +50,60 @@ def wait_for_launch(keyword="launch"):
         else:
             print(f"Commande inconnue. Tape '{keyword}' pour lancer ou 'exit' pour annuler.")
 
-def main():
+def load_spec(path: str) -> dict:
+    """
+    Lit une spec de run non interactive : les champs de la cible (nom, prenom, pseudo, email,
+    numero, photo, localisation), en JSON, ou en TOML si le fichier finit par .toml.
+    Les valeurs sont validées avec les règles de la saisie (ingest_stand) ; ValueError sinon.
+    """
+    if path.endswith(".toml"):
+        import tomllib  # Python 3.11+
+        with open(path, "rb") as f:
+            spec = tomllib.load(f)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+    return ingest_stand.validate_target(spec)
+
+def use_cassette(path: str, mode: str):
+    """
+    Branche le client HIBP partagé sur une cassette (hibp_client.Cassette) :
+    'record' enregistre les réponses du run, 'replay' les rejoue sans réseau ni limiteur.
+    Le cache HIBP est contourné en lecture pour que chaque requête passe par la cassette, et le
+    catalogue des breaches est toujours synchronisé d'abord (enregistré, ou rechargé depuis la
+    cassette) : l'enrichissement ne dépend pas de l'état de sync_state de la base.
+    """
+    import breach_catalog
+    import email_search
+    from hibp_client import Cassette, HibpClient
+    cassette = Cassette(path, mode)
+    api_key = email_search._get_hibp_api_key()
+    if mode == "replay":
+        api_key = api_key or "replay"  # aucune requête n'est émise : la clé ne sert qu'à passer le contrôle
+    email_search.set_client(HibpClient(api_key=api_key, cassette=cassette))
+    email_search.HIBP_CACHE_MODE = "refresh" if mode == "record" else "bypass"
     db.init_db()
+    breach_catalog.sync_breach_catalog(force=True)  # GET /breaches sans en-têtes conditionnels
+    return cassette
+
+def print_module_result(res: dict):
+    """Affiche le résultat d'un module dès qu'il termine."""
+    name = res["module"]
+    if not res["ok"]:
+        print(f"Erreur module {name} ({res['elapsed']:.1f}s) :", res["error"])
+    elif name == "email":
+        print(f"Résultats email ({res['elapsed']:.1f}s) :", res["result"].get("notes", res["result"].get("hibp")))
+    elif name == "phone":
+        phone_res = res["result"]
+        if phone_res.get("ok"):
+            print("Résultat téléphone sauvegardé :", phone_res["result"])
+        else:
+            print("Erreur recherche téléphone :", phone_res.get("error"))
+    else:
+        print(f"Résultat {name} :", res["result"])
 
-    data = collect_inputs()
-
+def create_target(data: dict) -> int:
+    """Génère les alias, sauvegarde la cible (et sa photo) ; retourne target_id."""
     # Générer les alias (séparés par virgules)
     nom = data.get("nom", "")
     prenom = data.get("prenom", "")
@@ -60,35 +116,91 @@ def main():
     target_id = db.save_target(data)
     print(f"\nTarget créée (id={target_id}). Les données : {data}")
 
-    # Attendre le mot pour lancer toutes les recherches
-    if not wait_for_launch("launch"):
-        return
+    # La photo n'est pas une colonne de targets : elle va dans le stockage de pièces jointes
+    if data.get("photo"):
+        try:
+            stored = attachments.add_attachment(target_id, data["photo"], kind="photo")
+            print(f"Photo enregistrée (sha256={stored['sha256']}, {stored['size']} octets).")
+        except Exception as e:
+            print("Erreur lors de l'enregistrement de la photo :", e)
+    return target_id
 
+def run_searches(data: dict, target_id: int):
     print("Démarrage des modules de recherche ...")
 
-    # === Lancer la recherche email si fournie ===
-    email = data.get("email")
-    if email:
-        print(f"Lancement recherche email pour {email} ...")
-        res = email_module.search_email(email, target_id=target_id, save=True)
-        print("Résultats email :", res.get("notes", res.get("hibp")))
-    else:
-        print("Aucun email fourni, recherche email ignorée.")
+    # === Lancer en parallèle les modules dont l'entrée est fournie ===
+    for name, spec in orchestrator.MODULES.items():
+        if not data.get(spec["input"]):
+            print(f"Aucun {spec['input']} fourni, module {name} ignoré.")
+    orchestrator.run_modules(data, target_id, deadline=RUN_DEADLINE, on_result=print_module_result)
 
-    numero = data.get("numero") 
-    if numero:
-        print(f"Lancement recherche téléphone pour {numero} ...")
-        phone_res = phone_module.search_phone_and_save(numero, target_id=target_id, save=True)
-        if phone_res.get("ok"):
-            print("Résultat téléphone sauvegardé :", phone_res["result"])
-        else:
-            print("Erreur recherche téléphone :", phone_res.get("error"))
-    else:
-        print("Aucun numéro fourni, recherche téléphone ignorée.")
+    # D'autres modules (photo, social, etc.) s'ajoutent via orchestrator.register_module
 
-    # Ici je pourrais appeler d'autres modules (photo, phone, social, etc.)
-    
     print("Recherche terminée.")
 
+def main(spec: Optional[dict] = None, target_id: Optional[int] = None):
+    """
+    Sans argument : saisie interactive puis attente de 'launch'.
+    spec : champs déjà validés (load_spec) ; la cible est créée et les modules lancés sans invite.
+    target_id : relance les modules sur une cible existante, avec ses champs enregistrés.
+    """
+    db.init_db()
+
+    if target_id is not None:
+        from summary import fetch_target
+        data = fetch_target(target_id).to_dict()
+        print(f"Cible existante (id={target_id}) : {data}")
+        run_searches(data, target_id)
+        return
+
+    data = collect_inputs() if spec is None else dict(spec)
+    target_id = create_target(data)
+
+    # Attendre le mot pour lancer toutes les recherches
+    if spec is None and not wait_for_launch("launch"):
+        return
+
+    run_searches(data, target_id)
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="ShadowHunter: saisie d'une cible et lancement des modules de recherche")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--spec", metavar="FILE",
+                        help="Run non-interactively from a JSON or TOML (.toml) file holding the target fields")
+    source.add_argument("--target-id", type=int, default=None,
+                        help="Re-run the search modules for an existing target")
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument("--record", metavar="FILE", help="Record the HIBP HTTP responses of this run to FILE")
+    cassette.add_argument("--replay", metavar="FILE",
+                          help="Serve HIBP requests from responses recorded with --record (no network)")
+    parser.add_argument("--db", default=None, help="SQLite database path (default: SHADOWHUNTER_DB or shadowhunter.db)")
+    parser.add_argument("--profile", nargs="?", const="-", default=None, metavar="FILE",
+                        help="Print a JSON timing breakdown at the end (to FILE, or stderr)")
+    args = parser.parse_args()
+
+    spec = None
+    if args.spec:
+        try:
+            spec = load_spec(args.spec)
+        except (OSError, ValueError) as e:  # tomllib.TOMLDecodeError et json.JSONDecodeError dérivent de ValueError
+            parser.error(f"invalid spec {args.spec}:\n{e}")
+    if args.db:
+        db.set_db_path(args.db)
+    if args.profile:
+        metrics.enable()
+
+    recorder = None
+    try:
+        if args.record or args.replay:
+            try:
+                recorder = use_cassette(args.record or args.replay, "record" if args.record else "replay")
+            except (OSError, ValueError, LookupError) as e:  # LookupError : CassetteMiss (cassette sans catalogue)
+                parser.error(f"cannot use cassette {args.record or args.replay}: {e}")
+        with metrics.span("run.total"):
+            main(spec, args.target_id)
+    finally:
+        db.close_conn()
+        if recorder is not None:
+            recorder.save()
+        if args.profile:
+            metrics.dump(args.profile)
@@ -0,0 +1,105 @@
+# metrics.py
+# Instrumentation légère (spans chronométrés + compteurs), désactivée par défaut.
+# Désactivée, une fonction instrumentée ne coûte qu'un test de booléen avant l'appel réel.
+import json
+import math
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Dict, List, Optional
+
+ENABLED = False
+
+_lock = threading.Lock()
+_durations: Dict[str, List[float]] = {}
+_counters: Dict[str, float] = {}
+
+
+def enable(on: bool = True):
+    global ENABLED
+    ENABLED = on
+
+
+def reset():
+    with _lock:
+        _durations.clear()
+        _counters.clear()
+
+
+def observe(name: str, seconds: float):
+    """Enregistre une durée mesurée ailleurs (ex. attente du limiteur de débit)."""
+    if not ENABLED:
+        return
+    with _lock:
+        _durations.setdefault(name, []).append(seconds)
+
+
+def incr(name: str, value: float = 1):
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+@contextmanager
+def span(name: str):
+    """Chronomètre le bloc sous `name` (no-op si désactivé)."""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def instrument(name: str):
+    """Décorateur : chaque appel est chronométré sous `name` quand l'instrumentation est active."""
+    def deco(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+        return wrapper
+    return deco
+
+
+def _percentile(values: List[float], q: float) -> float:
+    # rang le plus proche sur des valeurs triées : ceil(q * n), en indice à partir de 0
+    rank = max(0, min(len(values) - 1, math.ceil(q * len(values)) - 1))
+    return values[rank]
+
+
+def report() -> Dict[str, Any]:
+    """{"spans": {nom: {count, total, p50, p95, max}}, "counters": {nom: valeur}} (durées en secondes)."""
+    with _lock:
+        durations = {k: sorted(v) for k, v in _durations.items()}
+        counters = dict(_counters)
+    spans = {}
+    for name, values in sorted(durations.items(), key=lambda kv: -sum(kv[1])):
+        spans[name] = {
+            "count": len(values),
+            "total": round(sum(values), 6),
+            "p50": round(_percentile(values, 0.50), 6),
+            "p95": round(_percentile(values, 0.95), 6),
+            "max": round(values[-1], 6),
+        }
+    return {"spans": spans, "counters": dict(sorted(counters.items()))}
+
+
+def dump(path: Optional[str] = None):
+    """Écrit report() en JSON dans `path`, ou sur stderr si path vaut None ou '-'."""
+    text = json.dumps(report(), ensure_ascii=False, indent=2)
+    if path and path != "-":
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text, file=sys.stderr)
@@ -0,0 +1,170 @@
+# orchestrator.py
+import threading
+import time
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import db
+import metrics
+
+# ----------------------
+# Registre des modules
+# ----------------------
+# nom -> {"input": clé de data, "run": fonction(valeur, target_id, cancel, writer), "timeout": secondes}
+MODULES: Dict[str, Dict[str, Any]] = {}
+
+def register_module(name: str, input_key: str, timeout: Optional[float] = None):
+    """
+    Décorateur : enregistre un module de recherche.
+    La fonction reçoit (valeur, target_id, cancel, writer) où cancel est un threading.Event
+    à consulter pour abandonner proprement et writer le db.ResultWriter du run ; elle retourne
+    un dict de résultat, avec sous 'pending_writes' les Futures des écritures déposées.
+    """
+    def deco(func: Callable[[Any, Optional[int], threading.Event, db.ResultWriter], dict]):
+        MODULES[name] = {"input": input_key, "run": func, "timeout": timeout}
+        return func
+    return deco
+
+# Les modules de recherche (requests, phonenumbers...) ne sont importés qu'au moment de leur exécution
+@register_module("email", "email", timeout=120)
+def _run_email(email: str, target_id: Optional[int], cancel: threading.Event, writer: db.ResultWriter) -> dict:
+    import email_search as email_module
+    return email_module.search_email(email, target_id=target_id, save=True, writer=writer, cancel=cancel)
+
+@register_module("phone", "numero", timeout=30)
+def _run_phone(numero: str, target_id: Optional[int], cancel: threading.Event, writer: db.ResultWriter) -> dict:
+    import telephone_search as phone_module
+    return phone_module.search_phone_and_save(numero, target_id=target_id, save=True, writer=writer)
+
+# ----------------------
+# Orchestration
+# ----------------------
+def _guarded(name: str, spec: dict, value, target_id, cancel: threading.Event, writer: db.ResultWriter) -> dict:
+    start = time.monotonic()
+    if cancel.is_set():
+        return {"module": name, "ok": False, "error": "cancelled", "result": None, "elapsed": 0.0}
+    try:
+        with metrics.span("module." + name):
+            res = spec["run"](value, target_id, cancel, writer)
+        return {"module": name, "ok": True, "error": None, "result": res, "elapsed": time.monotonic() - start}
+    except Exception as e:
+        return {"module": name, "ok": False, "error": str(e), "result": None, "elapsed": time.monotonic() - start}
+
+def _settle_writes(res: dict) -> dict:
+    """
+    Attend les écritures différées déposées par le module (au plus un lot du writer) :
+    'pending_writes' est remplacé par 'saved' (lignes insérées), un échec d'écriture rend le module en erreur.
+    """
+    result = res.get("result")
+    futures = result.pop("pending_writes", None) if isinstance(result, dict) else None
+    if not futures:
+        return res
+    try:
+        result["saved"] = sum(f.result() for f in futures)
+    except Exception as e:
+        res["ok"] = False
+        res["error"] = f"DB save error: {e}"
+    return res
+
+def _start_module(slots: threading.Semaphore, name: str, func, *args) -> Future:
+    """
+    Exécute func(*args) dans un thread démon et retourne son Future. Contrairement aux workers d'un
+    ThreadPoolExecutor, joints à la sortie de l'interpréteur, un module abandonné (timeout, annulation)
+    ne retient pas le process. slots borne le nombre de modules exécutés en même temps.
+    """
+    fut: Future = Future()
+
+    def runner():
+        with slots:
+            if not fut.set_running_or_notify_cancel():
+                return
+            try:
+                fut.set_result(func(*args))
+            except BaseException as e:
+                fut.set_exception(e)
+
+    threading.Thread(target=runner, name="module-" + name, daemon=True).start()
+    return fut
+
+def run_modules(data: dict, target_id: Optional[int], enabled: Optional[Iterable[str]] = None,
+                deadline: Optional[float] = None, on_result: Optional[Callable[[dict], None]] = None,
+                cancel: Optional[threading.Event] = None, max_workers: Optional[int] = None,
+                writer: Optional[db.ResultWriter] = None) -> Dict[str, dict]:
+    """
+    Lance en parallèle (pool de threads) les modules enregistrés dont l'entrée est présente dans data.
+    - enabled : noms de modules à lancer (tous par défaut)
+    - deadline : durée maximale du run en secondes ; au-delà, les modules restants sont marqués 'timeout'
+    - on_result : appelé avec chaque résultat dès que le module termine
+    - cancel : Event ; s'il est levé pendant le run (ou sur Ctrl-C) les modules non terminés sont abandonnés
+    - writer : db.ResultWriter partagé par les modules (un writer propre au run sinon, fermé à la fin) ;
+      le résultat d'un module n'est rapporté qu'une fois ses écritures commitées, et le writer est vidé en fin de run
+    Retourne {nom: {"module", "ok", "error", "result", "elapsed"}}.
+    Un thread hors délai ne peut pas être tué : son Event d'annulation est levé (les attentes HIBP
+    s'interrompent) et il est abandonné ; thread démon, il n'empêche pas le process de se terminer.
+    """
+    cancel = cancel or threading.Event()
+    names = list(enabled) if enabled is not None else list(MODULES)
+    todo = {n: MODULES[n] for n in names if data.get(MODULES[n]["input"])}
+    results: Dict[str, dict] = {}
+    if not todo:
+        return results
+
+    own_writer = writer is None
+    writer = writer or db.ResultWriter()
+
+    def report(res: dict):
+        _settle_writes(res)
+        results[res["module"]] = res
+        if on_result:
+            on_result(res)
+
+    start = time.monotonic()
+    slots = threading.Semaphore(max_workers or len(todo))
+    futures = {}  # future -> (nom, Event d'annulation, échéance ou None)
+    for name, spec in todo.items():
+        module_cancel = threading.Event()
+        limits = [x for x in (spec["timeout"], deadline) if x is not None]
+        end = start + min(limits) if limits else None
+        fut = _start_module(slots, name, _guarded, name, spec, data[spec["input"]], target_id, module_cancel, writer)
+        futures[fut] = (name, module_cancel, end)
+
+    def abandon(fut, reason: str):
+        name, module_cancel, _ = futures[fut]
+        module_cancel.set()
+        fut.cancel()
+        report({"module": name, "ok": False, "error": reason, "result": None, "elapsed": time.monotonic() - start})
+
+    pending = set(futures)
+    try:
+        while pending:
+            if cancel.is_set():
+                for f in pending:
+                    abandon(f, "cancelled")
+                break
+            ends = [futures[f][2] for f in pending if futures[f][2] is not None]
+            timeout = max(0.0, min(ends) - time.monotonic()) if ends else None
+            # réveil périodique pour observer cancel
+            timeout = 0.5 if timeout is None else min(timeout, 0.5)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for f in done:
+                report(f.result())
+            now = time.monotonic()
+            for f in [f for f in pending if futures[f][2] is not None and futures[f][2] <= now]:
+                pending.discard(f)
+                abandon(f, "timeout")
+    except KeyboardInterrupt:
+        cancel.set()
+        for f in pending:
+            abandon(f, "cancelled")
+        raise
+    finally:
+        for f in pending:
+            f.cancel()  # modules pas encore démarrés (max_workers atteint)
+        try:
+            if own_writer:
+                writer.close()
+            else:
+                writer.flush()
+        except db.WriteError:
+            pass  # échecs déjà rapportés dans le résultat de chaque module
+    return results
@@ -0,0 +1,147 @@
+# phone_prefixes.py
+# Index compact des indicatifs pays E.164, utilisé quand phonenumbers n'est pas installé.
+# Le trie est stocké dans des tableaux plats (array) chargés depuis calling_codes.tsv.
+import os
+import threading
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calling_codes.tsv")
+
+# Trie des chiffres : _children[node * 10 + d] = nœud fils (0 = absent, la racine est le nœud 0)
+_children: Optional[array] = None
+# _terminal[node] = indicatif se terminant sur ce nœud (0 = aucun)
+_terminal: Optional[array] = None
+# indicatif -> [(région, préfixe national, longueurs possibles)], région principale en premier
+_regions_by_code: Dict[int, List[Tuple[str, str, Tuple[int, ...]]]] = {}
+# région -> indicatif
+_code_by_region: Dict[str, int] = {}
+_load_lock = threading.Lock()
+
+
+def _load():
+    if _children is None:
+        with _load_lock:
+            if _children is None:
+                _build()
+
+
+def _build():
+    global _children, _terminal
+    children = array("i", [0] * 10)
+    terminal = array("i", [0])
+    with open(DATA_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            code_s, region, national_prefix, lengths = line.rstrip("\n").split("\t")
+            code = int(code_s)
+            if code not in _regions_by_code:
+                node = 0
+                for ch in code_s:
+                    slot = node * 10 + int(ch)
+                    if not children[slot]:
+                        children[slot] = len(terminal)
+                        children.extend([0] * 10)
+                        terminal.append(0)
+                    node = children[slot]
+                terminal[node] = code
+                _regions_by_code[code] = []
+            _regions_by_code[code].append((
+                region,
+                "" if national_prefix == "-" else national_prefix,
+                tuple(int(x) for x in lengths.split(",") if x),
+            ))
+            _code_by_region.setdefault(region, code)
+    _terminal = terminal
+    _children = children
+
+
+def match_calling_code(digits: str) -> Optional[int]:
+    """Indicatif pays en tête de `digits` (chiffres E.164 sans '+'), ou None."""
+    _load()
+    node = 0
+    for ch in digits[:3]:
+        node = _children[node * 10 + ord(ch) - 48]
+        if not node:
+            return None
+        if _terminal[node]:
+            # les indicatifs E.164 sont sans préfixe commun : le premier trouvé est le bon
+            return _terminal[node]
+    return None
+
+
+def calling_code_for_region(region: str) -> Optional[int]:
+    _load()
+    return _code_by_region.get(region.upper())
+
+
+def regions_for_code(code: int) -> List[str]:
+    _load()
+    return [r for r, _, _ in _regions_by_code.get(code, [])]
+
+
+def _possible_lengths(code: int, region: Optional[str] = None) -> set:
+    entries = _regions_by_code.get(code, [])
+    if region:
+        entries = [e for e in entries if e[0] == region] or entries
+    return {n for _, _, lengths in entries for n in lengths}
+
+
+def fallback_phone_info(raw: str, default_region: str = "SN") -> Dict[str, Any]:
+    """
+    Équivalent léger de quick_phone_info sans phonenumbers : indicatif, région et contrôle de
+    longueur (is_possible). La validité réelle (plages attribuées) n'est pas vérifiable : is_valid = None.
+    Un numéro sans '+' / '00' est interprété dans default_region : indicatif de la région déjà en tête
+    (ex. 221778028663, forme stockée par la saisie) ou préfixe national retirés si besoin.
+    country reste None (pas de noms de pays hors phonenumbers, dont le geocoder donne "Senegal") :
+    le code ISO est dans region.
+    """
+    _load()
+    stripped = raw.strip()
+    digits = "".join(ch for ch in stripped if ch.isdigit())
+    info = {
+        "raw": raw,
+        "e164": None,
+        "is_valid": None,
+        "is_possible": False,
+        "country": None,
+        "carrier": None,
+        "country_code": None,
+        "region": None,
+    }
+    if not digits:
+        return info
+
+    if stripped.startswith("+") or digits.startswith("00"):
+        intl = digits[2:] if not stripped.startswith("+") else digits
+        code = match_calling_code(intl)
+        if code is None:
+            return info
+        national = intl[len(str(code)):]
+        region = regions_for_code(code)[0]
+    else:
+        region = default_region.upper()
+        code = calling_code_for_region(region)
+        if code is None:
+            return info
+        national = digits
+        lengths = _possible_lengths(code, region)
+        code_s = str(code)
+        if national.startswith(code_s) and len(national) not in lengths \
+                and len(national) - len(code_s) in lengths:
+            national = national[len(code_s):]
+        prefix = next((p for r, p, _ in _regions_by_code[code] if r == region), "")
+        # préfixe national retiré dès que la forme sans préfixe a une longueur possible (AE : 0501234567
+        # -> 501234567, alors que 10 chiffres sont aussi possibles) ; gardé seulement sinon
+        if prefix and national.startswith(prefix) and len(national) - len(prefix) in lengths:
+            national = national[len(prefix):]
+
+    possible = len(national) in _possible_lengths(code, region)
+    info.update({
+        "e164": f"+{code}{national}" if possible else None,
+        "is_possible": possible,
+        "country_code": code,
+        "region": region,
+    })
+    return info
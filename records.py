@@ -0,0 +1,104 @@
+# records.py
+# Types compacts (__slots__) pour les lignes lues en base par summary.py.
+# Le payload brut (raw_json) reste encodé tel que stocké et n'est décodé qu'au premier accès.
+from typing import Any, Dict
+
+import db
+
+_UNSET = object()
+
+
+class _Record:
+    __slots__ = ()
+    _fields: tuple = ()  # ordre des clés de to_dict()
+
+    def __init__(self, *values):
+        for name, value in zip(self._fields, values):
+            setattr(self, name, value)
+
+    # accès façon dict, pour les appelants qui manipulaient les anciens dicts
+    def get(self, key: str, default=None):
+        return getattr(self, key, default) if key in self._fields else default
+
+    def __getitem__(self, key: str):
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def keys(self):
+        return self._fields
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self._fields}
+
+    def __repr__(self):
+        return f"{type(self).__name__}(id={getattr(self, 'id', None)!r})"
+
+
+class _RawRecord(_Record):
+    """Enregistrement avec payload brut décodé paresseusement (db.load_raw) puis mémorisé."""
+    __slots__ = ()
+
+    def _decoded_raw(self):
+        if self._raw is _UNSET:
+            self._raw = db.load_raw(self._raw_blob)
+            self._raw_blob = None
+        return self._raw
+
+
+class Target(_Record):
+    __slots__ = ("id", "created_at", "nom", "prenom", "pseudo", "email", "numero", "localisation", "alias")
+    _fields = __slots__
+
+
+class Breach(_RawRecord):
+    __slots__ = ("id", "email", "breach_name", "breach_title", "breach_date", "breach_domain", "found_at",
+                 "_raw_blob", "_raw")
+    _fields = ("id", "email", "breach_name", "breach_title", "breach_date", "breach_domain", "raw_json", "found_at")
+
+    def __init__(self, id, email, breach_name, breach_title, breach_date, breach_domain, raw_blob, found_at):
+        self.id, self.email, self.breach_name, self.breach_title = id, email, breach_name, breach_title
+        self.breach_date, self.breach_domain, self.found_at = breach_date, breach_domain, found_at
+        self._raw_blob, self._raw = raw_blob, _UNSET
+
+    @property
+    def raw_json(self):
+        return self._decoded_raw()
+
+
+class SourceResult(_RawRecord):
+    __slots__ = ("id", "source", "type", "url", "score", "summary", "found_at", "_raw_blob", "_raw")
+    _fields = ("id", "source", "type", "url", "score", "summary", "raw", "found_at")
+
+    def __init__(self, id, source, type, url, score, summary, raw_blob, found_at):
+        self.id, self.source, self.type, self.url = id, source, type, url
+        self.score, self.summary, self.found_at = score, summary, found_at
+        self._raw_blob, self._raw = raw_blob, _UNSET
+
+    @property
+    def raw(self):
+        return self._decoded_raw()
+
+
+class PhoneLookup(_RawRecord):
+    __slots__ = ("id", "numero", "e164", "country", "carrier", "is_valid", "is_possible", "found_at",
+                 "_raw_blob", "_raw")
+    _fields = ("id", "numero", "e164", "country", "carrier", "is_valid", "is_possible", "raw", "found_at")
+
+    def __init__(self, id, numero, e164, country, carrier, is_valid, is_possible, raw_blob, found_at):
+        self.id, self.numero, self.e164, self.country, self.carrier = id, numero, e164, country, carrier
+        self.is_valid = bool(is_valid) if is_valid is not None else None
+        self.is_possible = bool(is_possible) if is_possible is not None else None
+        self.found_at = found_at
+        self._raw_blob, self._raw = raw_blob, _UNSET
+
+    @property
+    def raw(self):
+        return self._decoded_raw()
+
+
+def json_default(obj):
+    """Pour json.dump(s)(..., default=json_default) : sérialise les enregistrements via to_dict()."""
+    if isinstance(obj, _Record):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
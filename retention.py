@@ -0,0 +1,215 @@
+# retention.py
+# Politique de rétention de la base : purge des lignes trop anciennes (par table), purge en cascade
+# des cibles clôturées, suppression par lots courts (le writer n'attend jamais longtemps le verrou)
+# et récupération progressive de l'espace via auto_vacuum=INCREMENTAL.
+# Usage : python retention.py [--dry-run] [--close ID ...] [--vacuum-pages N] [--db chemin]
+import os
+import time
+from typing import Dict, Iterable, Optional
+
+import attachments
+import db
+
+# Âge maximal des lignes, en jours, par table (None = jamais purgé).
+# Surchargeable par variable d'environnement : SHADOWHUNTER_RETENTION_SOURCE_RESULTS=90, etc.
+DEFAULT_RETENTION_DAYS: Dict[str, Optional[float]] = {
+    "email_breaches": 730,
+    "source_results": 180,
+    "phone_lookups": 365,
+    "summaries": 90,
+    "hibp_cache": 30,
+}
+# table -> (colonne de date, "text" pour CURRENT_TIMESTAMP ou "epoch" pour time.time())
+AGE_COLUMNS = {
+    "email_breaches": ("found_at", "text"),
+    "source_results": ("found_at", "text"),
+    "phone_lookups": ("found_at", "text"),
+    "summaries": ("created_at", "text"),
+    "hibp_cache": ("fetched_at", "epoch"),
+}
+# Tables rattachées à une cible (colonne target_id), purgées avec elle
+TARGET_TABLES = ("email_breaches", "source_results", "phone_lookups", "summaries", "target_attachments")
+
+# Délai (jours) entre la clôture d'une cible et sa purge
+CLOSED_TARGET_GRACE_DAYS = float(os.environ.get("SHADOWHUNTER_CLOSED_GRACE_DAYS", "30"))
+# Lignes supprimées par transaction, et pause entre deux lots pour laisser passer les autres écritures
+PURGE_BATCH_SIZE = 1000
+PURGE_PAUSE = 0.01
+# Pages rendues au système de fichiers par passage d'incremental_vacuum (4 Kio par page par défaut)
+VACUUM_STEP_PAGES = 2000
+
+
+def retention_days() -> Dict[str, Optional[float]]:
+    """Âges maximaux effectifs (défauts + variables d'environnement ; 0 ou 'none' = pas de purge)."""
+    days = {}
+    for table, default in DEFAULT_RETENTION_DAYS.items():
+        value = os.environ.get(f"SHADOWHUNTER_RETENTION_{table.upper()}")
+        if value is None:
+            days[table] = default
+        else:
+            days[table] = None if value.strip().lower() in ("", "0", "none") else float(value)
+    return days
+
+
+def _cutoff(table: str, days: float):
+    """Condition SQL + paramètre sélectionnant les lignes de `table` plus anciennes que `days` jours."""
+    column, kind = AGE_COLUMNS[table]
+    if kind == "epoch":
+        return f"{column} < ?", time.time() - days * 86400
+    return f"{column} < datetime('now', ?)", f"-{days} days"
+
+
+def _delete_batches(table: str, where: str, params: tuple, batch_size: int, dry_run: bool = False) -> int:
+    """Supprime les lignes de `table` vérifiant `where`, par transactions de batch_size lignes au plus."""
+    if dry_run:
+        return db.get_conn().execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params).fetchone()[0]
+    total = 0
+    while True:
+        with db.transaction() as conn:
+            deleted = conn.execute(
+                f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} LIMIT ?)",
+                (*params, batch_size),
+            ).rowcount
+        total += deleted
+        if deleted < batch_size:
+            return total
+        time.sleep(PURGE_PAUSE)
+
+
+def purge_expired(days: Optional[Dict[str, Optional[float]]] = None, batch_size: int = PURGE_BATCH_SIZE,
+                  dry_run: bool = False) -> Dict[str, int]:
+    """Supprime les lignes plus anciennes que l'âge maximal de leur table. Retourne {table: lignes}."""
+    days = retention_days() if days is None else days
+    purged = {}
+    for table, max_age in days.items():
+        if max_age is None:
+            continue
+        where, param = _cutoff(table, max_age)
+        purged[table] = _delete_batches(table, where, (param,), batch_size, dry_run)
+    return purged
+
+
+def close_target(target_id: int) -> bool:
+    """Marque une cible comme clôturée (purgée après CLOSED_TARGET_GRACE_DAYS). False si introuvable."""
+    with db.transaction() as conn:
+        cur = conn.execute(
+            "UPDATE targets SET closed_at = COALESCE(closed_at, CURRENT_TIMESTAMP) WHERE id = ?", (target_id,)
+        )
+    return cur.rowcount > 0
+
+
+def purge_target(target_id: int, batch_size: int = PURGE_BATCH_SIZE, dry_run: bool = False) -> Dict[str, int]:
+    """Supprime une cible et toutes ses lignes (tables de TARGET_TABLES, par lots). Retourne {table: lignes}."""
+    purged = {table: _delete_batches(table, "target_id = ?", (target_id,), batch_size, dry_run)
+              for table in TARGET_TABLES}
+    purged["targets"] = _delete_batches("targets", "id = ?", (target_id,), 1, dry_run)
+    return purged
+
+
+def purge_closed_targets(grace_days: float = CLOSED_TARGET_GRACE_DAYS, batch_size: int = PURGE_BATCH_SIZE,
+                         dry_run: bool = False) -> Dict[int, Dict[str, int]]:
+    """Purge en cascade les cibles clôturées depuis plus de grace_days jours. Retourne {target_id: {table: lignes}}."""
+    ids = [r[0] for r in db.get_conn().execute(
+        "SELECT id FROM targets WHERE closed_at IS NOT NULL AND closed_at < datetime('now', ?)",
+        (f"-{grace_days} days",),
+    )]
+    return {tid: purge_target(tid, batch_size, dry_run) for tid in ids}
+
+
+# ----------------------
+# Espace disque
+# ----------------------
+def db_stats() -> Dict[str, int]:
+    conn = db.get_conn()
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {
+        "auto_vacuum": conn.execute("PRAGMA auto_vacuum").fetchone()[0],  # 0 aucun, 1 complet, 2 incrémental
+        "page_size": page_size,
+        "page_count": pages,
+        "freelist_count": free,
+        "size_bytes": page_size * pages,
+    }
+
+
+def enable_incremental_vacuum() -> bool:
+    """
+    Passe une base existante en auto_vacuum=INCREMENTAL (VACUUM complet unique, hors transaction,
+    qui réécrit tout le fichier). Retourne False si c'était déjà le cas.
+    """
+    with db.locked_conn() as conn:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+    return True
+
+
+def incremental_vacuum(max_pages: int = VACUUM_STEP_PAGES) -> int:
+    """Rend au plus max_pages pages libres au système de fichiers. Retourne le nombre de pages rendues."""
+    with db.locked_conn() as conn:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return 0
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # executescript (sqlite3_exec) exécute la pragma jusqu'au bout ; execute() n'en ferait qu'une étape (une page)
+        conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+        return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def run_maintenance(days: Optional[Dict[str, Optional[float]]] = None, close: Iterable[int] = (),
+                    purge: Iterable[int] = (), grace_days: float = CLOSED_TARGET_GRACE_DAYS,
+                    batch_size: int = PURGE_BATCH_SIZE, vacuum_pages: int = VACUUM_STEP_PAGES, dry_run: bool = False) -> dict:
+    """
+    Clôture des cibles `close`, purge immédiate des cibles `purge`, purge par ancienneté,
+    purge des cibles clôturées depuis grace_days jours, puis vacuum borné à vacuum_pages pages.
+    """
+    before = db_stats()
+    closed = [tid for tid in close if not dry_run and close_target(tid)]
+    report = {
+        "dry_run": dry_run,
+        "closed": closed,
+        "purged_targets": {tid: purge_target(tid, batch_size, dry_run) for tid in purge},
+        "expired": purge_expired(days, batch_size, dry_run),
+        "closed_targets": purge_closed_targets(grace_days, batch_size, dry_run),
+        # fichiers de pièces jointes qui ne sont plus rattachés à aucune cible
+        "orphan_attachments": attachments.collect_orphans(dry_run),
+        "vacuumed_pages": 0 if dry_run else incremental_vacuum(vacuum_pages),
+        "before": before,
+        "after": db_stats(),
+    }
+    if before["auto_vacuum"] != 2:
+        report["warning"] = "auto_vacuum n'est pas INCREMENTAL : relancer avec --enable-auto-vacuum (VACUUM complet)"
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description="Database maintenance: retention purge and incremental vacuum")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would be purged")
+    parser.add_argument("--close", type=int, nargs="*", default=[], metavar="TARGET_ID",
+                        help="Mark these targets as closed (purged after the grace period)")
+    parser.add_argument("--purge-target", type=int, nargs="*", default=[], metavar="TARGET_ID",
+                        help="Purge these targets and all their rows now")
+    parser.add_argument("--grace-days", type=float, default=CLOSED_TARGET_GRACE_DAYS,
+                        help="Days between closing a target and purging it")
+    parser.add_argument("--batch-size", type=int, default=PURGE_BATCH_SIZE, help="Rows deleted per transaction")
+    parser.add_argument("--vacuum-pages", type=int, default=VACUUM_STEP_PAGES,
+                        help="Maximum free pages returned to the filesystem in this run")
+    parser.add_argument("--enable-auto-vacuum", action="store_true",
+                        help="Switch an existing database to auto_vacuum=INCREMENTAL (runs a full VACUUM once)")
+    parser.add_argument("--db", default=None, help="SQLite database path (default: SHADOWHUNTER_DB or shadowhunter.db)")
+    args = parser.parse_args()
+
+    if args.db:
+        db.set_db_path(args.db)
+    try:
+        db.init_db()
+        if args.enable_auto_vacuum and not args.dry_run:
+            enable_incremental_vacuum()
+        res = run_maintenance(close=args.close, purge=args.purge_target, grace_days=args.grace_days,
+                              batch_size=args.batch_size, vacuum_pages=args.vacuum_pages, dry_run=args.dry_run)
+        print(json.dumps(res, indent=2, ensure_ascii=False))
+    finally:
+        db.close_conn()
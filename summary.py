@@ -1,197 +1,373 @@
 # summary.py
 import os
+import filecmp
+import gzip
+import hashlib
+import importlib.util
+import io
+import itertools
 import json
+import re
 import sqlite3
-from typing import Any, Dict, List, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
 # optional: openai (install with `pip install openai`) if you want to use an LLM
-try:
-    import openai
-    _HAS_OPENAI = True
-except Exception:
-    _HAS_OPENAI = False
+# Only looked up here; the package itself is imported by _call_llm when an LLM call is actually made.
+_HAS_OPENAI = importlib.util.find_spec("openai") is not None
 
-DB_NAME = "shadowhunter.db"
+import db
+import metrics
+from records import Target, Breach, SourceResult, PhoneLookup, json_default
 
 def get_conn():
-    return sqlite3.connect(DB_NAME)
+    """Connexion partagée gérée par db (même base, mêmes pragmas)."""
+    return db.get_conn()
 
 # ----------------------
 # Data gathering helpers
 # ----------------------
-def fetch_target(target_id: int) -> Dict[str, Any]:
+def fetch_target(target_id: int, conn=None) -> Target:
     """Récupère la ligne targets pour target_id."""
-    conn = get_conn()
+    conn = conn or get_conn()
     cur = conn.cursor()
     cur.execute("SELECT id, created_at, nom, prenom, pseudo, email, numero, localisation, alias FROM targets WHERE id = ?", (target_id,))
     row = cur.fetchone()
-    conn.close()
     if not row:
         raise ValueError(f"Target id={target_id} introuvable.")
-    keys = ["id", "created_at", "nom", "prenom", "pseudo", "email", "numero", "localisation", "alias"]
-    return dict(zip(keys, row))
-
-def fetch_email_breaches(target_id: int) -> List[Dict[str, Any]]:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id, email, breach_name, breach_title, breach_date, breach_domain, raw_json, found_at FROM email_breaches WHERE target_id = ?", (target_id,))
-    rows = cur.fetchall()
-    conn.close()
-    items = []
-    for r in rows:
-        items.append({
-            "id": r[0],
-            "email": r[1],
-            "breach_name": r[2],
-            "breach_title": r[3],
-            "breach_date": r[4],
-            "breach_domain": r[5],
-            "raw_json": json.loads(r[6]) if r[6] else None,
-            "found_at": r[7]
-        })
-    return items
-
-def fetch_source_results(target_id: int) -> List[Dict[str, Any]]:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id, source, type, url, score, summary, raw_json, found_at FROM source_results WHERE target_id = ?", (target_id,))
-    rows = cur.fetchall()
-    conn.close()
-    items = []
-    for r in rows:
-        try:
-            raw = json.loads(r[6]) if r[6] else None
-        except Exception:
-            raw = r[6]
-        items.append({
-            "id": r[0],
-            "source": r[1],
-            "type": r[2],
-            "url": r[3],
-            "score": r[4],
-            "summary": r[5],
-            "raw": raw,
-            "found_at": r[7]
-        })
-    return items
-
-def fetch_phone_lookups(target_id: int) -> List[Dict[str, Any]]:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id, numero, e164, country, carrier, is_valid, is_possible, raw_json, found_at FROM phone_lookups WHERE target_id = ?", (target_id,))
-    rows = cur.fetchall()
-    conn.close()
-    items = []
-    for r in rows:
-        try:
-            raw = json.loads(r[7]) if r[7] else None
-        except Exception:
-            raw = r[7]
-        items.append({
-            "id": r[0],
-            "numero": r[1],
-            "e164": r[2],
-            "country": r[3],
-            "carrier": r[4],
-            "is_valid": bool(r[5]) if r[5] is not None else None,
-            "is_possible": bool(r[6]) if r[6] is not None else None,
-            "raw": raw,
-            "found_at": r[8]
-        })
-    return items
+    return Target(*row)
+
+# Les itérateurs produisent des enregistrements records.* : raw_json reste encodé jusqu'au premier accès
+def iter_email_breaches(target_id: int, conn=None, after_id: int = 0) -> Iterator[Breach]:
+    """Parcourt les breaches de target_id ligne par ligne (curseur, pas de fetchall), jointes au catalogue."""
+    conn = conn or get_conn()
+    cur = conn.execute("""
+        SELECT e.id, e.email, NULLIF(b.name, ''), b.title, b.breach_date, b.domain, b.raw_json, e.found_at
+        FROM email_breaches e JOIN breaches b ON b.id = e.breach_id
+        WHERE e.target_id = ? AND e.id > ? ORDER BY e.id
+    """, (target_id, after_id))
+    for r in cur:
+        yield Breach(*r)
+
+def iter_source_results(target_id: int, conn=None, after_id: int = 0) -> Iterator[SourceResult]:
+    conn = conn or get_conn()
+    cur = conn.execute("SELECT id, source, type, url, score, summary, raw_json, found_at FROM source_results WHERE target_id = ? AND id > ? ORDER BY id", (target_id, after_id))
+    for r in cur:
+        yield SourceResult(*r)
+
+def iter_phone_lookups(target_id: int, conn=None, after_id: int = 0) -> Iterator[PhoneLookup]:
+    conn = conn or get_conn()
+    cur = conn.execute("SELECT id, numero, e164, country, carrier, is_valid, is_possible, raw_json, found_at FROM phone_lookups WHERE target_id = ? AND id > ? ORDER BY id", (target_id, after_id))
+    for r in cur:
+        yield PhoneLookup(*r)
+
+def fetch_email_breaches(target_id: int) -> List[Breach]:
+    return list(iter_email_breaches(target_id))
+
+def fetch_source_results(target_id: int) -> List[SourceResult]:
+    return list(iter_source_results(target_id))
+
+def fetch_phone_lookups(target_id: int) -> List[PhoneLookup]:
+    return list(iter_phone_lookups(target_id))
 
 # ----------------------
 # Assemble report
 # ----------------------
-def assemble_report_items(target_id: int) -> List[Dict[str, Any]]:
-    """Rassemble toutes les infos concernant target_id en une liste d'items numérotés."""
-    target = fetch_target(target_id)
-    items: List[Dict[str, Any]] = []
+RESULT_TABLES = ("email_breaches", "source_results", "phone_lookups")
+
+def _count_upto(conn, table: str, target_id: int, max_id: int) -> int:
+    return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE target_id = ? AND id <= ?", (target_id, max_id)).fetchone()[0]
+
+def _numbering_preserved(previous_counts: Dict[str, int], counts: Dict[str, int]) -> bool:
+    """
+    Vrai si chaque item déjà résumé garde son numéro. Le rapport liste breaches, sources puis lookups :
+    une nouvelle ligne décale tous les items des catégories suivantes, elle n'est donc admise que dans
+    la dernière catégorie non vide du résumé précédent ou après.
+    """
+    last = max((i for i, t in enumerate(RESULT_TABLES) if previous_counts.get(t, 0)), default=-1)
+    return all(counts[t] == previous_counts.get(t, 0) for t in RESULT_TABLES[:max(last, 0)])
+
+def iter_report_items(target_id: int, conn=None, after_ids: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Produit les items numérotés de target_id un par un, sur une seule connexion.
+    Rien n'est matérialisé : les exporteurs peuvent consommer le générateur directement.
+    after_ids ({table: id}) : ne produit que les lignes plus récentes (delta), avec leur numéro
+    définitif dans le rapport complet ; l'item cible n'est alors pas repris.
+    """
+    conn = conn or get_conn()
+    target = fetch_target(target_id, conn)
 
     # item 1 = target basic
-    items.append({
-        "index": 1,
-        "category": "target",
-        "summary": f"Target basic info (id={target['id']})",
-        "data": target
-    })
+    if after_ids is None:
+        yield {
+            "index": 1,
+            "category": "target",
+            "summary": f"Target basic info (id={target['id']})",
+            "data": target
+        }
 
     idx = 2
+    after_ids = after_ids or {}
 
     # email breaches
-    breaches = fetch_email_breaches(target_id)
-    for b in breaches:
-        items.append({
+    after = after_ids.get("email_breaches", 0)
+    idx += _count_upto(conn, "email_breaches", target_id, after) if after else 0
+    for b in iter_email_breaches(target_id, conn, after):
+        yield {
             "index": idx,
             "category": "email_breach",
             "summary": f"Email breach: {b.get('breach_name') or 'unknown'}",
             "data": b
-        })
+        }
         idx += 1
 
     # source results
-    sources = fetch_source_results(target_id)
-    for s in sources:
-        items.append({
+    after = after_ids.get("source_results", 0)
+    idx += _count_upto(conn, "source_results", target_id, after) if after else 0
+    for s in iter_source_results(target_id, conn, after):
+        yield {
             "index": idx,
             "category": "source_result",
             "summary": f"Source {s.get('source')} / {s.get('type')}",
             "data": s
-        })
+        }
         idx += 1
 
     # phone lookups
-    phones = fetch_phone_lookups(target_id)
-    for p in phones:
-        items.append({
+    after = after_ids.get("phone_lookups", 0)
+    idx += _count_upto(conn, "phone_lookups", target_id, after) if after else 0
+    for p in iter_phone_lookups(target_id, conn, after):
+        yield {
             "index": idx,
             "category": "phone_lookup",
             "summary": f"Phone lookup: {p.get('numero')}",
             "data": p
-        })
+        }
         idx += 1
 
-    return items
+def report_fingerprint(target_id: int, conn=None) -> Dict[str, Any]:
+    """
+    Empreinte du contenu du rapport, calculée sans décoder les lignes :
+    - "base" : ligne cible + contenu du catalogue (nom, titre, domaine, date, raw_json encodé) des
+      breaches liées, soit ce que le delta incrémental (nouvelles lignes) ne transporte pas ;
+    - par table : nombre de lignes, id max, found_at max (par index).
+    Retourne {"hash", "base", "tables": {table: [count, max_id, max_found_at]}}.
+    """
+    conn = conn or get_conn()
+    target = fetch_target(target_id, conn)
+    tables = {}
+    for table in RESULT_TABLES:
+        tables[table] = list(conn.execute(
+            f"SELECT COUNT(*), COALESCE(MAX(id), 0), MAX(found_at) FROM {table} WHERE target_id = ?", (target_id,)
+        ).fetchone())
+    base = hashlib.sha256(json.dumps(target.to_dict(), ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    for row in conn.execute("""
+        SELECT b.name, b.title, b.domain, b.breach_date, b.raw_json FROM breaches b
+        WHERE b.id IN (SELECT breach_id FROM email_breaches WHERE target_id = ?) ORDER BY b.id
+    """, (target_id,)):
+        base.update(json.dumps(row[:4], ensure_ascii=False).encode("utf-8"))
+        raw = row[4]
+        base.update(raw if isinstance(raw, bytes) else str(raw).encode("utf-8"))
+    payload = json.dumps([base.hexdigest(), tables], sort_keys=True)
+    return {"hash": hashlib.sha256(payload.encode("utf-8")).hexdigest(), "base": base.hexdigest(), "tables": tables}
+
+def assemble_report_items(target_id: int) -> List[Dict[str, Any]]:
+    """Rassemble toutes les infos concernant target_id en une liste d'items numérotés."""
+    return list(iter_report_items(target_id))
+
+def _timed_report_items(target_id: int, after_ids: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    iter_report_items tel que consommé par summarize_target, chronométré sous "report.assemble_items".
+    Seul le temps passé à produire les items est compté, pas celui de l'exporteur ou du LLM qui les
+    consomme au fil de l'eau ; une mesure par parcours complet.
+    """
+    items = iter_report_items(target_id, after_ids=after_ids)
+    if not metrics.ENABLED:
+        yield from items
+        return
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            item = next(items, None)
+            elapsed += time.perf_counter() - start
+            if item is None:
+                return
+            yield item
+    finally:
+        metrics.observe("report.assemble_items", elapsed)
+
+# ----------------------
+# Recherche plein texte (index FTS5 de db._migration_11)
+# ----------------------
+SEARCH_LIMIT = 20
+
+def _fts_query(text: str) -> str:
+    """Requête FTS5 depuis un texte libre : chaque mot devient une phrase entre guillemets (ET implicite)."""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+def _positions(conn, table: str, target_id: int, ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Rang (à partir de 0) de chaque id parmi les lignes de la cible, en comptant par intervalles
+    d'id successifs sur l'index (target_id) : un seul parcours jusqu'au plus grand id demandé.
+    """
+    positions = {}
+    total, low = 0, 0
+    for row_id in sorted(set(ids)):
+        total += conn.execute(f"SELECT COUNT(*) FROM {table} WHERE target_id = ? AND id >= ? AND id < ?",
+                              (target_id, low, row_id)).fetchone()[0]
+        positions[row_id] = total
+        low = row_id
+    return positions
+
+def search_target(target_id: int, query: str, limit: int = SEARCH_LIMIT, conn=None,
+                  raw_query: bool = False) -> List[Dict[str, Any]]:
+    """
+    Recherche `query` dans les breaches (nom, titre, domaine) et les sources (résumé, URL) de target_id.
+    Retourne au plus `limit` items classés par pertinence (bm25), au format de iter_report_items
+    avec le même numéro d'item que dans le rapport, plus "rank" (plus petit = plus pertinent).
+    raw_query=True passe `query` tel quel à FTS5 (opérateurs OR, NEAR, préfixes...).
+    """
+    conn = conn or get_conn()
+    fts = query if raw_query else _fts_query(query)
+    if not fts:
+        return []
+    hits = []
+    for row in conn.execute("""
+        SELECT e.id, e.email, NULLIF(b.name, ''), b.title, b.breach_date, b.domain, b.raw_json, e.found_at, f.rank
+        FROM breaches_fts f
+        JOIN breaches b ON b.id = f.rowid
+        JOIN email_breaches e ON e.breach_id = b.id
+        WHERE breaches_fts MATCH ? AND e.target_id = ?
+        ORDER BY f.rank LIMIT ?
+    """, (fts, target_id, limit)):
+        b = Breach(*row[:8])
+        hits.append({"category": "email_breach", "summary": f"Email breach: {b.breach_name or 'unknown'}",
+                     "data": b, "rank": row[8]})
+    # la cible est filtrée dans l'index plein texte (colonne target_id), pas après coup
+    for row in conn.execute("""
+        SELECT s.id, s.source, s.type, s.url, s.score, s.summary, s.raw_json, s.found_at, f.rank
+        FROM source_results_fts f
+        JOIN source_results s ON s.id = f.rowid
+        WHERE source_results_fts MATCH ?
+        ORDER BY f.rank LIMIT ?
+    """, (f'target_id:"{int(target_id)}" AND ({fts})', limit)):
+        r = SourceResult(*row[:8])
+        hits.append({"category": "source_result", "summary": f"Source {r.source} / {r.type}", "data": r, "rank": row[8]})
+
+    hits.sort(key=lambda h: (h["rank"], h["category"], h["data"].id))
+    hits = hits[:limit]
+
+    # numéros d'item du rapport, calculés pour les seuls items retenus
+    breach_pos = _positions(conn, "email_breaches", target_id,
+                            [h["data"].id for h in hits if h["category"] == "email_breach"])
+    source_pos = _positions(conn, "source_results", target_id,
+                            [h["data"].id for h in hits if h["category"] == "source_result"])
+    first_source_index = 2 + conn.execute(
+        "SELECT COUNT(*) FROM email_breaches WHERE target_id = ?", (target_id,)).fetchone()[0]
+    for h in hits:
+        if h["category"] == "email_breach":
+            h["index"] = 2 + breach_pos[h["data"].id]
+        else:
+            h["index"] = first_source_index + source_pos[h["data"].id]
+    return [{"index": h["index"], "category": h["category"], "summary": h["summary"], "data": h["data"],
+             "rank": h["rank"]} for h in hits]
 
 # ----------------------
 # Export helpers
 # ----------------------
-def export_json(items: List[Dict[str, Any]], filename: str) -> str:
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump({"items": items}, f, ensure_ascii=False, indent=2)
+def _open_export(filename: str, compress: bool):
+    """Ouvre le fichier d'export en écriture texte, compressé gzip si demandé."""
+    if compress:
+        # mtime=0 : même contenu => mêmes octets (permet de détecter un export inchangé)
+        return io.TextIOWrapper(gzip.GzipFile(filename, "wb", mtime=0), encoding="utf-8")
+    return open(filename, "w", encoding="utf-8")
+
+@metrics.instrument("export.json")
+def export_json(items: Iterable[Dict[str, Any]], filename: str, compress: bool = False) -> str:
+    """Écrit {"items": [...]} item par item (même rendu que json.dump indent=2), sans matérialiser la liste."""
+    with _open_export(filename, compress) as f:
+        f.write('{\n  "items": [')
+        first = True
+        for it in items:
+            f.write("\n" if first else ",\n")
+            first = False
+            f.write("\n".join("    " + line for line in json.dumps(it, ensure_ascii=False, indent=2, default=json_default).split("\n")))
+        f.write("]\n}" if first else "\n  ]\n}")
     return filename
 
-def export_txt(items: List[Dict[str, Any]], filename: str) -> str:
-    lines = []
-    for it in items:
-        lines.append(f"{it['index']}. [{it['category']}] {it['summary']}")
-        # pretty print the data as compact json for readability
-        try:
-            lines.append(json.dumps(it['data'], ensure_ascii=False, indent=2))
-        except Exception:
-            lines.append(str(it['data']))
-        lines.append("")  # blank line
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write("\n".join(lines))
+@metrics.instrument("export.ndjson")
+def export_ndjson(items: Iterable[Dict[str, Any]], filename: str, compress: bool = False) -> str:
+    """Écrit un item JSON compact par ligne (NDJSON)."""
+    with _open_export(filename, compress) as f:
+        for it in items:
+            f.write(json.dumps(it, ensure_ascii=False, separators=(",", ":"), default=json_default))
+            f.write("\n")
+    return filename
+
+@metrics.instrument("export.txt")
+def export_txt(items: Iterable[Dict[str, Any]], filename: str, compress: bool = False) -> str:
+    with _open_export(filename, compress) as f:
+        first = True
+        for it in items:
+            if not first:
+                f.write("\n")  # blank line
+            first = False
+            f.write(f"{it['index']}. [{it['category']}] {it['summary']}\n")
+            # pretty print the data as compact json for readability
+            try:
+                f.write(json.dumps(it['data'], ensure_ascii=False, indent=2, default=json_default))
+            except Exception:
+                f.write(str(it['data']))
+            f.write("\n")
     return filename
 
+# format -> (exporteur, extension)
+EXPORTERS = {
+    "json": (export_json, ".json"),
+    "ndjson": (export_ndjson, ".ndjson"),
+    "txt": (export_txt, ".txt"),
+}
+
 # ----------------------
 # LLM summarization
 # ----------------------
-def _call_llm(prompt: str, model: str = "gpt-4o-mini") -> str:
+# Budget de tokens par appel (prompt de données) et parallélisme des appels "map"
+LLM_CHUNK_TOKENS = int(os.environ.get("LLM_CHUNK_TOKENS", "6000"))
+LLM_MAX_PARALLEL = int(os.environ.get("LLM_MAX_PARALLEL", "4"))
+# Longueur max conservée pour une chaîne d'un payload brut
+LLM_RAW_STR_MAX = 160
+
+_SYSTEM_PROMPT = "Tu es un assistant qui résume des rapports OSINT de façon concise, claire et structurée."
+
+_REPORT_INSTRUCTIONS = (
+    "Fais :\n"
+    "1) Un résumé court (3-5 phrases) des informations principales trouvées.\n"
+    "2) Les éléments de preuve clés (liste par numéro d'item).\n"
+    "3) Les points d'attention / risques (liste courte).\n"
+    "4) Recommandations d'étapes suivantes (max 5).\n\n"
+)
+
+@metrics.instrument("llm.call")
+def _call_llm(prompt: str, model: str = "gpt-4o-mini", max_tokens: int = 800) -> str:
     """
     Appelle OpenAI si OPENAI_API_KEY est défini et openai lib est installée.
+    OPENAI_BASE_URL permet de viser un autre endpoint compatible chat-completions (ex: serveur local de test).
     Retourne le texte résumé.
     """
     api_key = os.environ.get("OPENAI_API_KEY")
     if not api_key or not _HAS_OPENAI:
         raise RuntimeError("OpenAI non configuré ou package openai manquant. Set OPENAI_API_KEY and install openai.")
 
+    import openai
     openai.api_key = api_key
+    if os.environ.get("OPENAI_BASE_URL"):
+        openai.api_base = os.environ["OPENAI_BASE_URL"]
 
     # build chat messages
     messages = [
-        {"role": "system", "content": "Tu es un assistant qui résume des rapports OSINT de façon concise, claire et structurée."},
+        {"role": "system", "content": _SYSTEM_PROMPT},
         {"role": "user", "content": prompt}
     ]
 
@@ -201,7 +377,7 @@ def _call_llm(prompt: str, model: str = "gpt-4o-mini") -> str:
             model=model,
             messages=messages,
             temperature=0.2,
-            max_tokens=800
+            max_tokens=max_tokens
         )
         # extract text
         text = resp["choices"][0]["message"]["content"].strip()
@@ -209,67 +385,170 @@ def _call_llm(prompt: str, model: str = "gpt-4o-mini") -> str:
     except Exception as e:
         raise RuntimeError(f"Erreur appel LLM: {e}")
 
-def llm_summarize_items(items: List[Dict[str, Any]], model: str = "gpt-4o-mini") -> str:
+def _estimate_tokens(text: str) -> int:
+    """Estimation grossière (~4 caractères par token) suffisante pour le découpage."""
+    return len(text) // 4 + 1
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+def _compact_value(value, depth: int = 0):
+    """Réduit un payload brut à l'essentiel : chaînes raccourcies (HTML retiré), listes et objets bornés."""
+    if isinstance(value, str):
+        text = " ".join(_TAG_RE.sub(" ", value).split())
+        return text if len(text) <= LLM_RAW_STR_MAX else text[:LLM_RAW_STR_MAX] + "…"
+    if isinstance(value, list):
+        if depth >= 2:
+            return f"[{len(value)} élément(s)]"
+        head = [_compact_value(v, depth + 1) for v in value[:8]]
+        return head + ([f"… +{len(value) - 8}"] if len(value) > 8 else [])
+    if isinstance(value, dict):
+        if depth >= 2:
+            return f"{{{len(value)} champ(s)}}"
+        return {k: _compact_value(v, depth + 1) for k, v in value.items()
+                if v not in (None, "", [], {}) and not str(k).lower().endswith(("logopath", "icon"))}
+    return value
+
+def compact_item(it: Dict[str, Any]) -> str:
+    """Représentation texte compacte d'un item pour le LLM (payload brut résumé au lieu d'être omis)."""
+    data = it.get("data", {})
+    if hasattr(data, "to_dict"):
+        data = data.to_dict()
+    safe_data = {}
+    for k, v in (data.items() if isinstance(data, dict) else []):
+        if v is None:
+            continue
+        safe_data[k] = _compact_value(v) if k in ("raw", "raw_json") else v
+    return f"{it['index']}. [{it['category']}] {it['summary']}\n{json.dumps(safe_data, ensure_ascii=False)}"
+
+def _pack_chunks(parts: Iterable[str], budget_tokens: int) -> List[List[str]]:
+    """Regroupe les parts en paquets dont la taille estimée ne dépasse pas budget_tokens (une part trop grosse reste seule)."""
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    used = 0
+    for part in parts:
+        cost = _estimate_tokens(part) + 1
+        if current and used + cost > budget_tokens:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(part)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _map_parallel(prompts: List[str], model: str) -> List[str]:
+    if len(prompts) == 1:
+        return [_call_llm(prompts[0], model=model)]
+    with ThreadPoolExecutor(max_workers=min(LLM_MAX_PARALLEL, len(prompts))) as pool:
+        return list(pool.map(lambda p: _call_llm(p, model=model), prompts))
+
+def llm_summarize_items(items: Iterable[Dict[str, Any]], model: str = "gpt-4o-mini",
+                        chunk_tokens: Optional[int] = None) -> str:
     """
-    Construit un prompt à partir des items et appelle le LLM pour obtenir un résumé.
-    Limite la taille du prompt si trop grand (on fournit les items essentiels).
+    Résumé LLM en map-reduce, sans troncature :
+    - chaque item est compacté puis les items sont regroupés en paquets de ~chunk_tokens tokens ;
+    - si tout tient dans un paquet : un seul appel avec les consignes du rapport ;
+    - sinon chaque paquet est résumé (appels parallèles, au plus LLM_MAX_PARALLEL) puis les
+      résumés partiels sont fusionnés (récursivement s'ils dépassent eux-mêmes le budget).
     """
-    # Build a compact textual representation
-    parts = []
-    for it in items:
-        # keep summary + compact JSON (no huge raw JSON)
-        data = it.get("data", {})
-        # remove potentially huge raw fields
-        safe_data = {k: (v if k != "raw" else "[raw omitted]") for k, v in (data.items() if isinstance(data, dict) else [])}
-        parts.append(f"{it['index']}. [{it['category']}] {it['summary']}\n{json.dumps(safe_data, ensure_ascii=False)}")
-
-    prompt_body = (
-        "Voici les éléments d'une enquête OSINT (numérotés). "
-        "Fais :\n"
-        "1) Un résumé court (3-5 phrases) des informations principales trouvées.\n"
-        "2) Les éléments de preuve clés (liste par numéro d'item).\n"
-        "3) Les points d'attention / risques (liste courte).\n"
-        "4) Recommandations d'étapes suivantes (max 5).\n\n"
-        "Données :\n\n" + "\n\n".join(parts)
-    )
-
-    # If prompt too large, truncate
-    if len(prompt_body) > 60000:
-        prompt_body = prompt_body[:59000] + "\n\n[TRUNCATED]"  # keep within token limits
-
-    return _call_llm(prompt_body, model=model)
+    budget = chunk_tokens or LLM_CHUNK_TOKENS
+    return _summarize_parts([compact_item(it) for it in items], model, budget)
+
+def _summarize_parts(parts: List[str], model: str, budget: int) -> str:
+    chunks = _pack_chunks(parts, budget)
+    if len(chunks) <= 1:
+        parts = chunks[0] if chunks else []
+        return _call_llm(
+            "Voici les éléments d'une enquête OSINT (numérotés). " + _REPORT_INSTRUCTIONS
+            + "Données :\n\n" + "\n\n".join(parts), model=model)
+
+    # map : résumés partiels, en gardant les numéros d'items cités
+    partials = _map_parallel([
+        f"Voici une partie ({i}/{len(chunks)}) des éléments d'une enquête OSINT (numérotés). "
+        "Résume les faits importants en citant les numéros d'items concernés, sans rien inventer.\n\n"
+        "Données :\n\n" + "\n\n".join(chunk)
+        for i, chunk in enumerate(chunks, 1)
+    ], model)
+
+    # reduce : tant que les résumés partiels ne tiennent pas dans un appel, on les fusionne par paquets
+    while True:
+        groups = _pack_chunks(partials, budget)
+        if len(groups) == 1 or len(groups) >= len(partials):
+            break
+        partials = _map_parallel([
+            "Fusionne ces résumés partiels d'une enquête OSINT en conservant les numéros d'items cités.\n\n"
+            + "\n\n---\n\n".join(group)
+            for group in groups
+        ], model)
+
+    return _call_llm(
+        "Voici les résumés partiels d'une enquête OSINT (les numéros renvoient aux items du rapport). "
+        + _REPORT_INSTRUCTIONS + "Résumés partiels :\n\n" + "\n\n---\n\n".join(partials), model=model)
+
+def llm_update_summary(previous: str, new_items: Iterable[Dict[str, Any]], model: str = "gpt-4o-mini",
+                       chunk_tokens: Optional[int] = None) -> str:
+    """
+    Mise à jour incrémentale : envoie le résumé précédent et seulement les nouveaux items.
+    Si le delta dépasse le budget, il est d'abord résumé en map-reduce puis fusionné.
+    """
+    budget = chunk_tokens or LLM_CHUNK_TOKENS
+    parts = [compact_item(it) for it in new_items]
+    if len(_pack_chunks(parts, budget)) <= 1:
+        delta = "\n\n".join(parts)
+    else:
+        delta = _summarize_parts(parts, model, budget)
+    return _call_llm(
+        "Voici le résumé précédent d'une enquête OSINT, puis les nouveaux éléments apparus depuis "
+        "(numérotés comme dans le rapport complet). Produis le résumé mis à jour. " + _REPORT_INSTRUCTIONS
+        + "Résumé précédent :\n\n" + previous + "\n\nNouveaux éléments :\n\n" + delta, model=model)
 
 # ----------------------
 # Fallback summarizer
 # ----------------------
-def local_summarize_items(items: List[Dict[str, Any]]) -> str:
+LOCAL_TOP_SOURCES = 3
+
+def fetch_target_stats(target_id: int, top: int = LOCAL_TOP_SOURCES, conn=None) -> Dict[str, Any]:
     """
-    Résumé simple si pas d'API LLM : extractive + counts
+    Agrégats SQL pour le résumé local, sans lire ni décoder les payloads :
+    ligne cible, nombre de lignes par catégorie et `top` meilleures sources (score décroissant)
+    avec leur numéro d'item dans le rapport.
     """
+    conn = conn or get_conn()
+    target = fetch_target(target_id, conn)
+    counts = {}
+    for table in RESULT_TABLES:
+        counts[table] = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE target_id = ?", (target_id,)).fetchone()[0]
+    first_source_index = 2 + counts["email_breaches"]
+    top_sources = []
+    for sid, source, summary, score in conn.execute("""
+        SELECT id, source, summary, score FROM source_results
+        WHERE target_id = ? ORDER BY score DESC, id LIMIT ?
+    """, (target_id, top)).fetchall():
+        position = conn.execute(
+            "SELECT COUNT(*) FROM source_results WHERE target_id = ? AND id < ?", (target_id, sid)
+        ).fetchone()[0]
+        top_sources.append({"index": first_source_index + position, "source": source, "summary": summary, "score": score})
+    return {"target": target, "counts": counts, "top_sources": top_sources}
+
+def _render_local_summary(target: Optional[Dict[str, Any]], counts: Dict[str, int], top_sources: List[Dict[str, Any]]) -> str:
     lines = []
     lines.append("Résumé (local) :")
     # Quick key facts from target
-    target_item = next((it for it in items if it["category"] == "target"), None)
-    if target_item:
-        t = target_item["data"]
+    if target:
+        t = target
         lines.append(f"- Cible: {t.get('prenom') or ''} {t.get('nom') or ''} (pseudo: {t.get('pseudo') or 'N/A'})")
         lines.append(f"- Email: {t.get('email') or 'N/A'}, Téléphone: {t.get('numero') or 'N/A'}")
         lines.append(f"- Alias proposés: {t.get('alias') or 'N/A'}")
     # counts
-    n_breaches = sum(1 for it in items if it["category"] == "email_breach")
-    n_sources = sum(1 for it in items if it["category"] == "source_result")
-    n_phones = sum(1 for it in items if it["category"] == "phone_lookup")
-    lines.append(f"- Breaches email trouvés: {n_breaches}")
-    lines.append(f"- Résultats web / sources: {n_sources}")
-    lines.append(f"- Lookups téléphone: {n_phones}")
-
-    # list top 3 source_result summaries
-    srcs = [it for it in items if it["category"] == "source_result"]
-    if srcs:
+    lines.append(f"- Breaches email trouvés: {counts.get('email_breaches', 0)}")
+    lines.append(f"- Résultats web / sources: {counts.get('source_results', 0)}")
+    lines.append(f"- Lookups téléphone: {counts.get('phone_lookups', 0)}")
+
+    # list top source_result summaries
+    if top_sources:
         lines.append("- Top sources (extraits) :")
-        for s in srcs[:3]:
-            summary = s.get("summary") or s["data"].get("summary") or ""
-            lines.append(f"  {s['index']}. {s.get('source')} - {summary}")
+        for s in top_sources:
+            lines.append(f"  {s['index']}. {s.get('source')} - {s.get('summary') or ''}")
 
     lines.append("\nRecommandations :")
     recs = [
@@ -283,65 +562,217 @@ def local_summarize_items(items: List[Dict[str, Any]]) -> str:
 
     return "\n".join(lines)
 
+def local_summarize_target(target_id: int) -> str:
+    """Résumé local calculé directement en SQL (temps constant quel que soit le nombre de résultats)."""
+    stats = fetch_target_stats(target_id)
+    return _render_local_summary(stats["target"], stats["counts"], stats["top_sources"])
+
+def local_summarize_items(items: Iterable[Dict[str, Any]]) -> str:
+    """
+    Résumé simple si pas d'API LLM : extractive + counts (une seule passe sur les items).
+    Pour un target en base, local_summarize_target évite de charger les items.
+    """
+    target = None
+    counts = {"email_breaches": 0, "source_results": 0, "phone_lookups": 0}
+    tables = {"email_breach": "email_breaches", "source_result": "source_results", "phone_lookup": "phone_lookups"}
+    sources = []
+    for it in items:
+        category = it["category"]
+        if category == "target":
+            target = target or it["data"]
+        elif category in tables:
+            counts[tables[category]] += 1
+            if category == "source_result":
+                data = it["data"]
+                sources.append({"index": it["index"], "source": data.get("source"),
+                                "summary": data.get("summary") or it.get("summary"), "score": data.get("score")})
+    # même ordre que fetch_target_stats : score décroissant (sans score en dernier), puis ordre du rapport
+    sources.sort(key=lambda s: (s["score"] is None, -(s["score"] or 0), s["index"]))
+    return _render_local_summary(target, counts, sources[:LOCAL_TOP_SOURCES])
+
 # ----------------------
 # Public entrypoint
 # ----------------------
-def summarize_target(target_id: int, out_dir: str = ".", send_to_llm: bool = True, model: str = "gpt-4o-mini") -> Dict[str, Any]:
+def _write_if_changed(path: str, write) -> bool:
     """
-    Rassemble toutes les infos d'un target_id, exporte JSON + TXT, envoie au LLM (optionnel) et retourne le résumé.
-    Retourne: { "files": {"json": path, "txt": path}, "summary": <text>, "llm_used": bool }
+    Écrit via write(tmp_path) dans un fichier temporaire et ne remplace `path` que si le contenu diffère.
+    Retourne True si le fichier a été (ré)écrit.
     """
-    items = assemble_report_items(target_id)
+    tmp = path + ".tmp"
+    write(tmp)
+    if os.path.exists(path) and filecmp.cmp(tmp, path, shallow=False):
+        os.remove(tmp)
+        return False
+    os.replace(tmp, path)
+    return True
+
+def _export_state_key(path: str) -> str:
+    return "report_export:" + os.path.abspath(path)
+
+def summarize_target(target_id: int, out_dir: str = ".", send_to_llm: bool = True, model: str = "gpt-4o-mini",
+                     formats: Iterable[str] = ("json", "txt"), compress: bool = False) -> Dict[str, Any]:
+    """
+    Rassemble toutes les infos d'un target_id, exporte dans les formats demandés (json, ndjson, txt),
+    compressés gzip si compress=True, envoie au LLM (optionnel) et retourne le résumé.
+    Le résumé est persisté en base avec l'empreinte des données (report_fingerprint) :
+    - données inchangées : le résumé enregistré est retourné sans recalcul ni appel LLM ;
+    - seulement de nouvelles lignes, cible et catalogue inchangés : le LLM reçoit le résumé précédent
+      + le delta (pas d'appel si le delta est vide) ; sinon le résumé est recalculé en entier ;
+    - les fichiers d'export ne sont réécrits que si leur contenu change.
+    Retourne: { "files": {"json": path, "txt": path, ...}, "summary": <text>, "llm_used": bool,
+                "cached": bool, "incremental": bool }
+    """
+    fp = report_fingerprint(target_id)
+    counts = {t: v[0] for t, v in fp["tables"].items()}
+    max_ids = {t: v[1] for t, v in fp["tables"].items()}
+    watermark = max((v[2] for v in fp["tables"].values() if v[2]), default=None)
 
     base = os.path.join(out_dir, f"target_{target_id}")
-    json_path = export_json(items, base + ".json")
-    txt_path = export_txt(items, base + ".txt")
+    files = {}
+    for fmt in formats:
+        exporter, ext = EXPORTERS[fmt]
+        path = base + ext + (".gz" if compress else "")
+        files[fmt] = path
+        key = _export_state_key(path)
+        if os.path.exists(path) and db.get_sync_state(key) == fp["hash"]:
+            continue
+        _write_if_changed(path, lambda tmp: exporter(_timed_report_items(target_id), tmp, compress=compress))
+        db.set_sync_state({key: fp["hash"]})
+
+    use_llm = send_to_llm and _HAS_OPENAI and bool(os.environ.get("OPENAI_API_KEY"))
+    mode = f"llm:{model}" if use_llm else "local"
+    previous = db.get_summary(target_id, mode)
 
     summary_text = None
     llm_used = False
+    cached = incremental = False
 
-    if send_to_llm:
+    if previous and previous["content_hash"] == fp["hash"]:
+        summary_text, llm_used, cached = previous["summary"], previous["llm_used"], True
+    elif use_llm:
         try:
-            # Build a concise text to send: use the TXT file content (already numbered)
-            with open(txt_path, "r", encoding="utf-8") as f:
-                txt_content = f.read()
-            if not _HAS_OPENAI or not os.environ.get("OPENAI_API_KEY"):
-                # no key or package: fall back
-                summary_text = local_summarize_items(items)
+            # delta possible si aucune ligne déjà résumée n'a disparu (seulement des ajouts), si ces ajouts
+            # ne renumérotent aucun item cité par le résumé précédent, et si la cible et le catalogue des
+            # breaches liées n'ont pas changé (le delta ne les transporte pas)
+            if previous and previous["llm_used"] and previous["max_ids"] \
+                    and previous["base_hash"] == fp["base"] \
+                    and _numbering_preserved(previous["counts"], counts) and all(
+                    _count_upto(get_conn(), t, target_id, previous["max_ids"].get(t, 0)) == previous["counts"].get(t, 0)
+                    for t in RESULT_TABLES):
+                new_items = _timed_report_items(target_id, after_ids=previous["max_ids"])
+                first = next(new_items, None)
+                if first is None:
+                    summary_text = previous["summary"]  # rien de nouveau à résumer
+                else:
+                    summary_text = llm_update_summary(previous["summary"], itertools.chain([first], new_items),
+                                                      model=model)
+                incremental = True
             else:
-                summary_text = llm_summarize_items(items, model=model)
-                llm_used = True
+                summary_text = llm_summarize_items(_timed_report_items(target_id), model=model)
+            llm_used = True
         except Exception as e:
             # On any error, fallback to local summary and include the error note
-            summary_text = local_summarize_items(items) + f"\n\n(Note: LLM error: {e})"
-            llm_used = False
+            summary_text = local_summarize_target(target_id) + f"\n\n(Note: LLM error: {e})"
+            llm_used = incremental = False
     else:
-        summary_text = local_summarize_items(items)
+        # no key or package, or send_to_llm=False: local summary
+        summary_text = local_summarize_target(target_id)
+
+    # Persist the summary (not the fallback written after an LLM error, so the next run retries)
+    if not cached and (llm_used or not use_llm):
+        db.save_summary(target_id, mode, fp["hash"], watermark, max_ids, counts, summary_text, llm_used, fp["base"])
 
     # Save the summary to file
     summary_file = base + ".summary.txt"
-    with open(summary_file, "w", encoding="utf-8") as f:
-        f.write(summary_text)
+
+    def write_summary(path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(summary_text)
+    _write_if_changed(summary_file, write_summary)
+    files["summary"] = summary_file
 
     return {
-        "files": {"json": json_path, "txt": txt_path, "summary": summary_file},
+        "files": files,
         "summary": summary_text,
-        "llm_used": llm_used
+        "llm_used": llm_used,
+        "cached": cached,
+        "incremental": incremental
     }
 
 # ----------------------
 # CLI quick-run
 # ----------------------
+def _search_main(argv: List[str]):
+    """python summary.py search TARGET_ID QUERY... : recherche plein texte dans les résultats d'une cible."""
+    import argparse
+    parser = argparse.ArgumentParser(prog="summary.py search", description="Full-text search in a target's findings")
+    parser.add_argument("target_id", type=int, help="ID of target to search")
+    parser.add_argument("query", nargs="+", help="Words to search (all must match)")
+    parser.add_argument("--limit", type=int, default=SEARCH_LIMIT, help=f"Maximum results (default: {SEARCH_LIMIT})")
+    parser.add_argument("--raw", action="store_true", help="Pass QUERY unchanged to FTS5 (OR, NEAR, prefix*...)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--db", default=None, help="SQLite database path (default: SHADOWHUNTER_DB or shadowhunter.db)")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        db.set_db_path(args.db)
+    try:
+        db.init_db()
+        hits = search_target(args.target_id, " ".join(args.query), limit=args.limit, raw_query=args.raw)
+    except sqlite3.OperationalError as e:
+        parser.exit(2, f"Requête invalide : {e}\n")
+    finally:
+        db.close_conn()
+    if args.json:
+        print(json.dumps(hits, ensure_ascii=False, indent=2, default=json_default))
+        return
+    for it in hits:
+        data = it["data"]
+        detail = data.breach_domain if it["category"] == "email_breach" else data.url
+        print(f"{it['index']}. [{it['category']}] {it['summary']} — {detail}")
+    if not hits:
+        print("Aucun résultat.")
+
+
 if __name__ == "__main__":
     import argparse
+    import sys
+    if sys.argv[1:2] == ["search"]:
+        _search_main(sys.argv[2:])
+        sys.exit(0)
     parser = argparse.ArgumentParser(description="Summary generator for a target")
     parser.add_argument("target_id", type=int, help="ID of target to summarize")
     parser.add_argument("--out", default=".", help="Output directory")
     parser.add_argument("--no-llm", action="store_true", help="Don't call remote LLM; use local summary")
     parser.add_argument("--model", default="gpt-4o-mini", help="LLM model to use (OpenAI)")
+    parser.add_argument("--format", default="json,txt",
+                        help="Comma-separated export formats among: " + ", ".join(EXPORTERS) + " (default: json,txt)")
+    parser.add_argument("--gzip", action="store_true", help="Gzip-compress export files (.gz)")
+    parser.add_argument("--db", default=None, help="SQLite database path (default: SHADOWHUNTER_DB or shadowhunter.db)")
+    parser.add_argument("--profile", nargs="?", const="-", default=None, metavar="FILE",
+                        help="Print a JSON timing breakdown at the end (to FILE, or stderr)")
     args = parser.parse_args()
 
-    res = summarize_target(args.target_id, out_dir=args.out, send_to_llm=not args.no_llm, model=args.model)
+    formats = [f.strip() for f in args.format.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in EXPORTERS]
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(unknown)}")
+
+    if args.db:
+        db.set_db_path(args.db)
+    if args.profile:
+        metrics.enable()
+
+    try:
+        # une base antérieure aux migrations (sans breaches, sync_state, summaries...) est mise à jour d'abord
+        db.init_db()
+        with metrics.span("summary.run"):
+            res = summarize_target(args.target_id, out_dir=args.out, send_to_llm=not args.no_llm, model=args.model,
+                                   formats=formats, compress=args.gzip)
+    finally:
+        db.close_conn()
+        if args.profile:
+            metrics.dump(args.profile)
     print("Fichiers générés :", res["files"])
     print("\nRésumé :\n")
     print(res["summary"])
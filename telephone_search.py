@@ -1,43 +1,50 @@
 # telephone_search.py
 import json
-from typing import Dict, Any, Optional
+from functools import lru_cache
+from typing import Dict, Any, Iterable, List, Optional
 
 # dépendance optionnelle, installe via: pip install phonenumbers
-try:
-    import phonenumbers
-    from phonenumbers import geocoder, carrier, NumberParseException
-    _HAS_PHONENUM = True
-except Exception:
-    _HAS_PHONENUM = False
+# Import paresseux (geocoder/carrier sont lourds) : fait au premier lookup par _has_phonenumbers()
+phonenumbers = geocoder = carrier = NumberParseException = None
+_HAS_PHONENUM: Optional[bool] = None
+
+def _has_phonenumbers() -> bool:
+    global phonenumbers, geocoder, carrier, NumberParseException, _HAS_PHONENUM
+    if _HAS_PHONENUM is None:
+        try:
+            with metrics.span("phone.load_metadata"):
+                import phonenumbers as _pn
+                from phonenumbers import geocoder as _geo, carrier as _car, NumberParseException as _npe
+            phonenumbers, geocoder, carrier, NumberParseException = _pn, _geo, _car, _npe
+            _HAS_PHONENUM = True
+        except Exception:
+            _HAS_PHONENUM = False
+    return _HAS_PHONENUM
 
 import db
+import metrics
+import phone_prefixes
 
-def quick_phone_info(raw: str, default_region: str = "SN") -> Dict[str, Any]:
-    """Retourne dict: e164, country, carrier, is_valid, is_possible, raw."""
-    if not raw:
-        return {"error": "empty_number", "raw": raw}
+# Taille du cache LRU des lookups (clé: (raw, default_region))
+PHONE_CACHE_SIZE = 4096
 
-    if not _HAS_PHONENUM:
-        # fallback simple si phonenumbers non installé
-        digits = "".join(ch for ch in raw if ch.isdigit() or ch == "+")
-        return {
-            "raw": raw,
-            "e164": digits if digits else None,
-            "is_valid": None,
-            "is_possible": None,
-            "country": None,
-            "carrier": None
-        }
+@lru_cache(maxsize=PHONE_CACHE_SIZE)
+def _cached_phone_info(raw: str, default_region: str) -> Dict[str, Any]:
+    """Calcul réel (mis en cache) ; ne pas modifier le dict retourné, quick_phone_info en renvoie une copie."""
+    if not _has_phonenumbers():
+        # fallback si phonenumbers non installé : index local des indicatifs (région + contrôle de longueur)
+        return phone_prefixes.fallback_phone_info(raw, default_region)
 
     try:
         pn = phonenumbers.parse(raw, default_region)
     except NumberParseException as e:
         return {"error": "parse_error", "message": str(e), "raw": raw}
 
+    is_valid = phonenumbers.is_valid_number(pn)
     info = {
         "raw": raw,
-        "e164": phonenumbers.format_number(pn, phonenumbers.PhoneNumberFormat.E164) if phonenumbers.is_valid_number(pn) else None,
-        "is_valid": phonenumbers.is_valid_number(pn),
+        "e164": phonenumbers.format_number(pn, phonenumbers.PhoneNumberFormat.E164) if is_valid else None,
+        "is_valid": is_valid,
         "is_possible": phonenumbers.is_possible_number(pn),
         "country": None,
         "carrier": None
@@ -54,14 +61,60 @@ def quick_phone_info(raw: str, default_region: str = "SN") -> Dict[str, Any]:
 
     return info
 
-def search_phone_and_save(numero: str, target_id: Optional[int] = None, save: bool = True) -> Dict[str, Any]:
+@metrics.instrument("phone.quick_info")
+def quick_phone_info(raw: str, default_region: str = "SN") -> Dict[str, Any]:
+    """Retourne dict: e164, country, carrier, is_valid, is_possible, raw."""
+    if not raw:
+        return {"error": "empty_number", "raw": raw}
+    return dict(_cached_phone_info(raw, default_region))
+
+def normalize_numbers(numbers: Iterable[str], default_region: str = "SN") -> List[Dict[str, Any]]:
+    """Normalise une liste de numéros d'un même dossier (les doublons ne sont calculés qu'une fois)."""
+    return [quick_phone_info(n, default_region) for n in numbers]
+
+def warm_metadata(regions: Iterable[str] = ("SN",), lang: str = "en") -> int:
+    """
+    Précharge les métadonnées geocoder/carrier (chargées paresseusement par phonenumbers)
+    pour les régions données, à partir de leur numéro d'exemple. Retourne le nombre de régions chauffées.
+    """
+    if not _has_phonenumbers():
+        return 0
+    warmed = 0
+    for region in regions:
+        pn = phonenumbers.example_number_for_type(region, phonenumbers.PhoneNumberType.MOBILE) \
+            or phonenumbers.example_number(region)
+        if pn is None:
+            continue
+        geocoder.description_for_number(pn, lang)
+        carrier.name_for_number(pn, lang)
+        warmed += 1
+    return warmed
+
+def cache_stats() -> Dict[str, Any]:
+    """Statistiques du cache LRU de quick_phone_info (hits, misses, maxsize, currsize)."""
+    return _cached_phone_info.cache_info()._asdict()
+
+def search_phone_and_save(numero: str, target_id: Optional[int] = None, save: bool = True,
+                          writer: Optional[db.ResultWriter] = None) -> Dict[str, Any]:
     """
     Récupère les infos locales via quick_phone_info et enregistre en DB via db.save_phone_lookup.
+    Avec un db.ResultWriter, l'enregistrement est déposé dans sa file (Future sous 'pending_writes').
     Retourne un dict avec le résumé.
     """
     result = quick_phone_info(numero)
     raw_json = json.dumps(result, ensure_ascii=False)
 
+    if save and writer is not None:
+        fut = writer.save_phone_lookups(target_id, [{
+            "numero": numero,
+            "e164": result.get("e164"),
+            "country": result.get("country"),
+            "carrier": result.get("carrier"),
+            "is_valid": result.get("is_valid"),
+            "is_possible": result.get("is_possible"),
+            "raw_json": raw_json,
+        }])
+        return {"ok": True, "result": result, "pending_writes": [fut]}
     if save:
         try:
             db.save_phone_lookup(